@@ -0,0 +1,52 @@
+"""
+💲 Cart summary latency for carts of 1 vs 200 lines.
+
+Times GET /cart/?summary=true with a cold price cache (every line repriced
+from `products`) and a warm one, and counts product queries per request,
+which should stay at one (cold) or zero (warm) whatever the cart size.
+
+    python -m benchmarks.cart_summary --repeat 50
+"""
+import argparse
+import asyncio
+
+from benchmarks.checkout import auth, fill_cart
+from benchmarks.common import app_client, seed_products, asgi_get, percentiles
+from core import database
+from core.pricing import price_cache
+
+
+async def measure(email, repeat, cold):
+    headers = auth(email)
+    samples = []
+    queries = price_cache.queries
+    for _ in range(repeat):
+        if cold:
+            price_cache.clear()
+        status, _, total, _ = await asgi_get("/cart/", "summary=true", headers)
+        assert status == 200, status
+        samples.append(total * 1000)
+    return percentiles(samples), (price_cache.queries - queries) / repeat
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--lines", type=int, nargs="+", default=[1, 200])
+    args = parser.parse_args()
+
+    async with app_client():
+        await seed_products(max(args.lines))
+        ids = [d["_id"] async for d in database.get_db()["products"].find({}, {"_id": 1})]
+
+        print(f"{'lines':>5} {'cache':>5} {'p50 ms':>8} {'p95 ms':>8} {'queries/req':>12}")
+        for lines in args.lines:
+            email = f"summary{lines}@example.com"
+            await fill_cart(email, ids[:lines], 1)
+            for cold in (True, False):
+                stats, queries = await measure(email, args.repeat, cold)
+                print(f"{lines:>5} {'cold' if cold else 'warm':>5} {stats['p50']:8.2f} {stats['p95']:8.2f} {queries:12.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
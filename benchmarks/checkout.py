@@ -0,0 +1,76 @@
+"""
+🧾 Checkout stress test and throughput.
+
+1. Oversell check: `--buyers` users each try to buy `--qty` units of a
+   single product stocked with `--stock` units, all at once. Exits non-zero
+   if stock goes negative or more units were sold than existed.
+2. Throughput: checkouts/sec for carts of 1, 10 and 50 lines.
+
+    python -m benchmarks.checkout --buyers 200 --stock 50
+"""
+import argparse
+import asyncio
+import sys
+
+from benchmarks.common import app_client, seed_products, Timer
+from core import carts, database
+from core.security import create_token
+
+
+def auth(email):
+    return {"Authorization": f"Bearer {create_token(email, 1, verified=True)}"}
+
+
+async def fill_cart(email, product_ids, qty):
+    await database.get_db()["carts"].bulk_write([
+        carts.add_item_op(email, {"_id": pid, "name": "x", "price": 1.0}, qty)
+        for pid in product_ids
+    ])
+
+
+async def oversell_check(client, buyers, stock, qty):
+    db = database.get_db()
+    product = await db["products"].insert_one({"name": "Hot item", "price": 1.0, "in_stock": stock, "category": "Deals"})
+    emails = [f"buyer{i}@example.com" for i in range(buyers)]
+    for email in emails:
+        await fill_cart(email, [product.inserted_id], qty)
+
+    responses = await asyncio.gather(*(client.post("/orders/place", headers=auth(e)) for e in emails))
+    placed = sum(r.status_code == 200 for r in responses)
+    left = (await db["products"].find_one({"_id": product.inserted_id}))["in_stock"]
+    sold = placed * qty
+    print(f"oversell: {placed}/{buyers} orders placed, {sold} sold, {left} left of {stock}")
+    return left >= 0 and sold + left == stock
+
+
+async def throughput(client, lines, checkouts):
+    db = database.get_db()
+    ids = [d["_id"] async for d in db["products"].find({}, {"_id": 1}).limit(lines)]
+    await db["products"].update_many({"_id": {"$in": ids}}, {"$set": {"in_stock": 10 ** 9}})
+    emails = [f"shopper{lines}-{i}@example.com" for i in range(checkouts)]
+    for email in emails:
+        await fill_cart(email, ids, 1)
+    with Timer() as t:
+        responses = await asyncio.gather(*(client.post("/orders/place", headers=auth(e)) for e in emails))
+    assert all(r.status_code == 200 for r in responses), [r.text for r in responses if r.status_code != 200][:1]
+    return checkouts / t.elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--buyers", type=int, default=200)
+    parser.add_argument("--stock", type=int, default=50)
+    parser.add_argument("--qty", type=int, default=1)
+    parser.add_argument("--checkouts", type=int, default=100)
+    args = parser.parse_args()
+
+    async with app_client() as client:
+        await seed_products(100)
+        ok = await oversell_check(client, args.buyers, args.stock, args.qty)
+        for lines in (1, 10, 50):
+            print(f"cart of {lines:>2} lines: {await throughput(client, lines, args.checkouts):8.1f} checkouts/s")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
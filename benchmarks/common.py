@@ -0,0 +1,102 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Benchmarks boot `main.app` against the in-memory (mongomock) backend, so they
+run offline without a Mongo server or SMTP account:
+
+    MONGO_BACKEND=memory python -m benchmarks.<name>
+"""
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from statistics import quantiles
+
+os.environ.setdefault("MONGO_BACKEND", "memory")
+os.environ.setdefault("SMTP_BACKEND", "local")
+
+import httpx
+from core import database
+from core.search import with_search_fields
+from main import app, lifespan
+
+
+@asynccontextmanager
+async def app_client():
+    async with lifespan(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            yield client
+
+
+async def seed_products(count: int, categories=("Books", "Electronics", "Toys", "Garden")):
+    docs = [
+        with_search_fields({
+            "name": f"Product {i}",
+            "description": f"Synthetic product number {i}",
+            "price": float(i % 500) + 0.99,
+            "in_stock": i % 50,
+            "category": categories[i % len(categories)],
+        })
+        for i in range(count)
+    ]
+    for start in range(0, len(docs), 10_000):
+        await database.get_db()["products"].insert_many(docs[start:start + 10_000])
+    return count
+
+
+async def asgi_get(path: str, query: str = "", headers=None):
+    """
+    Call the ASGI app directly and time the response without buffering it
+    (httpx's ASGITransport collects the whole body first). Returns
+    (status, seconds_to_first_byte, total_seconds, body_bytes).
+    """
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": query.encode(),
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        "client": ("127.0.0.1", 50000), "server": ("bench", 80),
+    }
+    state = {"status": None, "first": None, "bytes": 0, "requested": False}
+    done = asyncio.Event()
+    start = time.perf_counter()
+
+    async def receive():
+        if not state["requested"]:
+            state["requested"] = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Streaming responses poll for a disconnect; block until we are finished
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            state["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            body = message.get("body", b"")
+            if body and state["first"] is None:
+                state["first"] = time.perf_counter() - start
+            state["bytes"] += len(body)
+            if not message.get("more_body", False):
+                done.set()
+
+    await app(scope, receive, send)
+    return state["status"], state["first"] or 0.0, time.perf_counter() - start, state["bytes"]
+
+
+def percentiles(samples):
+    if len(samples) < 2:
+        value = samples[0] if samples else 0.0
+        return {"p50": value, "p95": value, "p99": value}
+    cuts = quantiles(samples, n=100)
+    return {"p50": cuts[49], "p95": cuts[94], "p99": cuts[98]}
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
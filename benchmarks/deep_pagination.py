@@ -0,0 +1,67 @@
+"""
+📄 Page 1 vs page N: offset pagination against keyset cursors.
+
+Seeds enough products for `--page` pages of 10 and times
+GET /products/filters for page 1 and page N, first with `?page=` (skip) and
+then with the equivalent `?cursor=` token.
+
+mongomock has no indexes, so run against a real server to see the keyset
+path stay flat:
+
+    MONGO_BACKEND=motor MONGO_URI=mongodb://localhost:27017 DB_NAME=bench \\
+        python -m benchmarks.deep_pagination --page 10000
+"""
+import argparse
+import asyncio
+import time
+from statistics import median
+
+from benchmarks.common import app_client, seed_products, asgi_get
+from core import database
+from core.pagination import encode_cursor
+from routes.product_routes import catalog_cache
+
+LIMIT = 10
+SORT = [("_id", 1)]
+
+
+async def timed(query: str, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        catalog_cache.invalidate()
+        start = time.perf_counter()
+        status, *_ = await asgi_get("/products/filters", query)
+        samples.append(time.perf_counter() - start)
+        assert status == 200, status
+    return median(samples) * 1000
+
+
+async def cursor_for_page(page: int):
+    """Token a client would hold after walking to `page` (the last _id of page - 1)."""
+    if page == 1:
+        return None
+    doc = await database.get_db()["products"].find({}, {"_id": 1}).sort(SORT).skip((page - 1) * LIMIT - 1).limit(1).to_list(1)
+    return encode_cursor(doc[0], SORT)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--page", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    async with app_client():
+        products = database.get_db()["products"]
+        await products.delete_many({})
+        await seed_products(args.page * LIMIT)
+
+        print(f"{'page':>7} {'offset ms':>10} {'keyset ms':>10}")
+        for page in (1, args.page):
+            offset_ms = await timed(f"page={page}", args.repeat)
+            token = await cursor_for_page(page)
+            keyset_ms = await timed(f"cursor={token}" if token else "", args.repeat)
+            print(f"{page:>7} {offset_ms:>10.2f} {keyset_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
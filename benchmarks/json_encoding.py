@@ -0,0 +1,74 @@
+"""
+⚡ Response serialization: per-document `_id` rewriting + jsonable_encoder +
+JSONResponse against BSONResponse, for order-shaped payloads of 1k and 10k
+documents. Pure CPU, no database.
+
+    python -m benchmarks.json_encoding --docs 1000 10000
+"""
+import argparse
+import copy
+from datetime import datetime
+from statistics import median
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from benchmarks.common import Timer
+from core.responses import BSONResponse, orjson
+
+
+def make_orders(count: int) -> list:
+    return [
+        {
+            "_id": ObjectId(),
+            "user_email": f"user{i % 100}@example.com",
+            "items": [
+                {"product_id": str(ObjectId()), "name": f"Product {j}", "price": 9.99 + j, "quantity": j + 1}
+                for j in range(3)
+            ],
+            "item_count": 3,
+            "total_amount": 47.97,
+            "status": "Delivered",
+            "created_at": datetime.utcnow(),
+        }
+        for i in range(count)
+    ]
+
+
+def legacy_path(docs):
+    for doc in docs:
+        doc["_id"] = str(doc["_id"])
+    return JSONResponse(jsonable_encoder({"orders": docs})).body
+
+def bson_path(docs):
+    return BSONResponse({"orders": docs}).body
+
+
+def timed(fn, docs, repeat):
+    samples = []
+    for _ in range(repeat):
+        payload = copy.deepcopy(docs)  # the legacy path mutates its input
+        with Timer() as t:
+            fn(payload)
+        samples.append(t.elapsed * 1000)
+    return median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, nargs="+", default=[1000, 10_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"encoder: {'orjson' if orjson else 'json (orjson not installed)'}")
+    print(f"{'docs':>6} {'legacy ms':>10} {'bson ms':>8} {'speedup':>8}")
+    for count in args.docs:
+        docs = make_orders(count)
+        legacy = timed(legacy_path, docs, args.repeat)
+        fast = timed(bson_path, docs, args.repeat)
+        print(f"{count:>6} {legacy:10.1f} {fast:8.1f} {legacy / fast:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+🏋️ Mixed-workload load test against the full app.
+
+Boots `main.app` on the in-memory store, seeds a synthetic catalog, users,
+carts and order history, then runs `--concurrency` virtual users for
+`--duration` seconds. Each virtual user repeatedly picks a workload by
+weight:
+
+    browse    category pages, following next_cursor
+    search    ranked name search
+    cart      add, summary, update, remove
+    checkout  bulk add, place order, order history
+    login     password login (bcrypt)
+
+Reports throughput and p50/p95/p99 per endpoint, optionally writes them as
+JSON, and compares against a saved baseline (exit 1 on regression):
+
+    python -m benchmarks.load_test --output baseline.json
+    python -m benchmarks.load_test --baseline baseline.json --tolerance 0.15
+
+Numbers from mongomock are only comparable with other mongomock runs; set
+MONGO_BACKEND=motor with MONGO_URI/DB_NAME to load a real server.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Cheap bcrypt by default so logins do not drown out everything else; override via env
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("SLOW_REQUEST_MS", "60000")
+# Every simulated user logs in from the same client address
+os.environ.setdefault("THROTTLE_LOGIN_PER_IP", "0")
+os.environ.setdefault("THROTTLE_LOGIN_PER_ACCOUNT", "0")
+
+from benchmarks.common import app_client, seed_products, percentiles, Timer
+from core import database
+from core.config import BCRYPT_ROUNDS
+from core.passwords import _hash
+from core.search import tokenize
+from core.security import create_token
+
+PASSWORD = "load-test-password"
+CATEGORIES = ("Books", "Electronics", "Toys", "Garden")
+DEFAULT_MIX = "browse=35,search=25,cart=20,checkout=10,login=10"
+
+
+# ---------------------- SEEDING ----------------------
+async def seed(products: int, users: int, orders_per_user: int, rng: random.Random):
+    db = database.get_db()
+    await seed_products(products, CATEGORIES)
+    await db["products"].update_many({}, {"$set": {"in_stock": 10 ** 9}})
+    catalog = [(str(p["_id"]), p["name"], p["price"]) async for p in db["products"].find({}, {"name": 1, "price": 1})]
+
+    hashed = _hash(PASSWORD, BCRYPT_ROUNDS)
+    emails = [f"load{i}@example.com" for i in range(users)]
+    now = datetime.utcnow()
+    await db["users"].insert_many([
+        {"email": email, "password": hashed, "role": "user", "is_verified": True, "created_at": now}
+        for email in emails
+    ])
+
+    history = []
+    for email in emails:
+        for n in range(orders_per_user):
+            items = [
+                {"product_id": pid, "name": name, "price": price, "quantity": rng.randint(1, 3)}
+                for pid, name, price in rng.sample(catalog, min(3, len(catalog)))
+            ]
+            history.append({
+                "user_email": email, "items": items, "item_count": len(items),
+                "total_amount": round(sum(i["price"] * i["quantity"] for i in items), 2),
+                "status": "Delivered", "created_at": now - timedelta(days=n),
+            })
+    for start in range(0, len(history), 10_000):
+        await db["orders"].insert_many(history[start:start + 10_000])
+
+    carts = [
+        {"_id": email, "updated_at": now, "items": {
+            pid: {"name": name, "price": price, "quantity": 1}
+            for pid, name, price in rng.sample(catalog, min(rng.randint(1, 5), len(catalog)))
+        }}
+        for email in emails[: users // 2]
+    ]
+    if carts:
+        await db["carts"].insert_many(carts)
+    return catalog, emails
+
+
+# ---------------------- WORKLOADS ----------------------
+class Recorder:
+    def __init__(self):
+        self.samples = {}  # endpoint -> [seconds]
+        self.errors = {}   # endpoint -> count
+
+    async def call(self, endpoint, request):
+        start = time.perf_counter()
+        response = await request
+        self.samples.setdefault(endpoint, []).append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+        return response
+
+
+async def browse(client, rec, user, ctx, rng):
+    category = rng.choice(CATEGORIES)
+    r = await rec.call("GET /products/filters (category)", client.get("/products/filters", params={"category": category}))
+    cursor = r.json().get("next_cursor") if r.status_code == 200 else None
+    if cursor:
+        await rec.call("GET /products/filters (cursor)", client.get("/products/filters", params={"category": category, "cursor": cursor}))
+
+async def search(client, rec, user, ctx, rng):
+    _, name, _ = rng.choice(ctx["catalog"])
+    term = " ".join(t[: rng.randint(1, len(t))] for t in tokenize(name)[:2])
+    await rec.call("GET /products/filters (search)", client.get("/products/filters", params={"name": term}))
+
+async def cart(client, rec, user, ctx, rng):
+    pid, _, _ = rng.choice(ctx["catalog"])
+    await rec.call("POST /cart/add/{product_id}", client.post(f"/cart/add/{pid}", headers=user["headers"]))
+    await rec.call("GET /cart/?summary=true", client.get("/cart/", params={"summary": "true"}, headers=user["headers"]))
+    await rec.call("PUT /cart/update/{product_id}", client.put(f"/cart/update/{pid}", params={"quantity": rng.randint(1, 4)}, headers=user["headers"]))
+    await rec.call("DELETE /cart/remove/{product_id}", client.delete(f"/cart/remove/{pid}", headers=user["headers"]))
+
+async def checkout(client, rec, user, ctx, rng):
+    items = [{"product_id": pid, "quantity": rng.randint(1, 2)} for pid, _, _ in rng.sample(ctx["catalog"], 3)]
+    await rec.call("POST /cart/bulk/add", client.post("/cart/bulk/add", json={"items": items}, headers=user["headers"]))
+    await rec.call("POST /orders/place", client.post("/orders/place", headers=user["headers"]))
+    await rec.call("GET /orders/my-orders", client.get("/orders/my-orders", headers=user["headers"]))
+
+async def login(client, rec, user, ctx, rng):
+    await rec.call("POST /auth/login", client.post("/auth/login", data={"username": user["email"], "password": PASSWORD}))
+
+WORKLOADS = {"browse": browse, "search": search, "cart": cart, "checkout": checkout, "login": login}
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in WORKLOADS:
+            raise SystemExit(f"Unknown workload {name!r}; choose from {', '.join(WORKLOADS)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+async def virtual_user(client, rec, user, ctx, mix, deadline, rng):
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        await WORKLOADS[rng.choices(names, weights)[0]](client, rec, user, ctx, rng)
+
+
+# ---------------------- REPORTING ----------------------
+def summarize(rec: Recorder, elapsed: float) -> dict:
+    endpoints = {}
+    for endpoint, samples in sorted(rec.samples.items()):
+        p = percentiles(samples)
+        endpoints[endpoint] = {
+            "count": len(samples),
+            "errors": rec.errors.get(endpoint, 0),
+            "rps": len(samples) / elapsed,
+            "p50_ms": p["p50"] * 1000,
+            "p95_ms": p["p95"] * 1000,
+            "p99_ms": p["p99"] * 1000,
+        }
+    total = sum(e["count"] for e in endpoints.values())
+    return {
+        "elapsed_s": elapsed,
+        "total": {"count": total, "errors": sum(rec.errors.values()), "rps": total / elapsed},
+        "endpoints": endpoints,
+    }
+
+def print_report(results: dict):
+    print(f"{'endpoint':<36} {'count':>7} {'err':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for endpoint, e in results["endpoints"].items():
+        print(f"{endpoint:<36} {e['count']:>7} {e['errors']:>5} {e['rps']:>8.1f} "
+              f"{e['p50_ms']:>8.2f} {e['p95_ms']:>8.2f} {e['p99_ms']:>8.2f}")
+    t = results["total"]
+    print(f"{'TOTAL':<36} {t['count']:>7} {t['errors']:>5} {t['rps']:>8.1f}")
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Print p95/throughput deltas per endpoint; returns the endpoints that regressed beyond `tolerance`."""
+    regressions = []
+    print(f"\n{'endpoint':<36} {'p95 base':>9} {'p95 now':>9} {'rps base':>9} {'rps now':>9}")
+    for endpoint, now in results["endpoints"].items():
+        base = baseline.get("endpoints", {}).get(endpoint)
+        if base is None:
+            print(f"{endpoint:<36} {'-':>9} {now['p95_ms']:>9.2f} {'-':>9} {now['rps']:>9.1f}  (new)")
+            continue
+        slower = now["p95_ms"] > base["p95_ms"] * (1 + tolerance)
+        fewer = now["rps"] < base["rps"] * (1 - tolerance)
+        flag = "  REGRESSION" if slower or fewer else ""
+        print(f"{endpoint:<36} {base['p95_ms']:>9.2f} {now['p95_ms']:>9.2f} {base['rps']:>9.1f} {now['rps']:>9.1f}{flag}")
+        if flag:
+            regressions.append(endpoint)
+    return regressions
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--orders-per-user", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of load after seeding")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Workload weights, e.g. browse=50,login=10")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--baseline", help="Compare against results JSON from an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed p95/throughput drift vs the baseline")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+    rng = random.Random(args.seed)
+
+    async with app_client() as client:
+        with Timer() as seeding:
+            catalog, emails = await seed(args.products, args.users, args.orders_per_user, rng)
+        print(f"seeded {args.products} products, {args.users} users, "
+              f"{args.users * args.orders_per_user} orders in {seeding.elapsed:.1f}s")
+
+        ctx = {"catalog": catalog}
+        users = [
+            {"email": email, "headers": {"Authorization": f"Bearer {create_token(email, 24, verified=True)}"}}
+            for email in emails
+        ]
+        rec = Recorder()
+        deadline = time.perf_counter() + args.duration
+        with Timer() as run:
+            await asyncio.gather(*(
+                virtual_user(client, rec, users[i % len(users)], ctx, mix, deadline, random.Random(args.seed * 1000 + i))
+                for i in range(args.concurrency)
+            ))
+
+    results = summarize(rec, run.elapsed)
+    results["config"] = {
+        "products": args.products, "users": args.users, "orders_per_user": args.orders_per_user,
+        "concurrency": args.concurrency, "duration": args.duration, "mix": mix, "seed": args.seed,
+        "backend": os.environ.get("MONGO_BACKEND"), "bcrypt_rounds": BCRYPT_ROUNDS,
+    }
+    print_report(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} endpoint(s) regressed beyond {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
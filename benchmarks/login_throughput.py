@@ -0,0 +1,52 @@
+"""
+🔐 Logins/sec versus password-hashing pool size.
+
+Runs a burst of concurrent bcrypt verifications through PasswordHasher for
+each pool size and reports throughput and rejections (503s).
+
+    python -m benchmarks.login_throughput --logins 200 --sizes 1 2 4 8
+"""
+import argparse
+import asyncio
+
+from fastapi import HTTPException
+
+from benchmarks.common import Timer
+from core.passwords import PasswordHasher, _hash
+
+
+async def burst(hasher: PasswordHasher, hashed: str, logins: int):
+    async def one():
+        try:
+            await hasher.verify("correct horse", hashed)
+            return True
+        except HTTPException:
+            return False
+
+    with Timer() as t:
+        results = await asyncio.gather(*(one() for _ in range(logins)))
+    return sum(results) / t.elapsed, results.count(False)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--executor", choices=["process", "thread"], default="process")
+    args = parser.parse_args()
+
+    hashed = _hash("correct horse", args.rounds)
+    print(f"{'workers':>8} {'logins/s':>10} {'rejected':>9}")
+    for size in args.sizes:
+        hasher = PasswordHasher(rounds=args.rounds, workers=size, max_pending=args.logins, executor=args.executor)
+        try:
+            await hasher.verify("correct horse", hashed)  # warm up the pool
+            rate, rejected = await burst(hasher, hashed, args.logins)
+        finally:
+            hasher.shutdown()
+        print(f"{size:>8} {rate:>10.1f} {rejected:>9}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
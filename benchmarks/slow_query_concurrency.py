@@ -0,0 +1,92 @@
+"""
+⏱️ Throughput of fast requests while one slow query is in flight.
+
+Compares a blocking driver call (what sync pymongo inside `async def` did)
+against an awaitable one (the Motor data layer). With the blocking call every
+concurrent request queues behind the slow query; with the async layer the
+fast requests keep flowing.
+
+    python -m benchmarks.slow_query_concurrency --requests 200 --delay 1.0
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import app_client, seed_products, Timer
+from core.database import get_database, get_db
+from main import app
+
+
+class _SlowUsers:
+    """`users` collection whose find_one stalls for `delay` once the timed window has opened."""
+
+    def __init__(self, collection, blocking: bool, delay: float):
+        self.collection = collection
+        self.blocking = blocking
+        self.delay = delay
+        self.entered = asyncio.Event()
+        self.window_open = asyncio.Event()
+        self.stalled_at = None
+
+    def __getattr__(self, attr):
+        return getattr(self.collection, attr)
+
+    async def find_one(self, *args, **kwargs):
+        self.entered.set()
+        await self.window_open.wait()
+        self.stalled_at = time.perf_counter()
+        if self.blocking:
+            time.sleep(self.delay)
+        else:
+            await asyncio.sleep(self.delay)
+        return await self.collection.find_one(*args, **kwargs)
+
+
+class _Database:
+    """The real database, except that `users` is the slow stand-in."""
+
+    def __init__(self, db, users):
+        self.db = db
+        self.users = users
+
+    def __getitem__(self, name):
+        return self.users if name == "users" else self.db[name]
+
+    def __getattr__(self, attr):
+        return getattr(self.db, attr)
+
+
+async def run(mode: str, requests: int, delay: float):
+    async with app_client() as client:
+        await seed_products(1_000)
+        # Routes get their collections through get_database, so the stand-in goes there
+        users = _SlowUsers(get_db()["users"], mode == "blocking", delay)
+        app.dependency_overrides[get_database] = lambda: _Database(get_db(), users)
+        try:
+            slow = asyncio.create_task(client.post("/auth/forgot-password", params={"email": "nobody@example.com"}))
+            await users.entered.wait()
+            with Timer() as t:
+                fast = asyncio.gather(*(client.get("/products/filters", params={"page": 1}) for _ in range(requests)))
+                users.window_open.set()
+                await fast
+            await slow
+        finally:
+            app.dependency_overrides.pop(get_database, None)
+    assert users.stalled_at is not None and t.start <= users.stalled_at <= t.start + t.elapsed, \
+        "the slow query did not run inside the timed window"
+    return requests / t.elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--delay", type=float, default=1.0)
+    args = parser.parse_args()
+
+    for mode in ("blocking", "async"):
+        rps = await run(mode, args.requests, args.delay)
+        print(f"{mode:>8}: {rps:8.1f} req/s with one {args.delay:.1f}s query in flight")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
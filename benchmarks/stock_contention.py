@@ -0,0 +1,81 @@
+"""
+🔥 Concurrent checkouts of one SKU: single `in_stock` field vs sharded counters.
+
+Each round stocks a fresh product with `--stock` units, fills `--buyers`
+carts with one unit each and places every order at once. Reports
+checkouts/s, latency percentiles, shard misses and an oversell check
+(sold + left must equal the starting stock).
+
+    python -m benchmarks.stock_contention --buyers 500 --stock 400 --shards 1 4 16
+
+Write contention only shows up against a real server
+(MONGO_BACKEND=motor MONGO_URI=...); the in-memory backend serializes every
+write, so there it only checks correctness.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+os.environ.setdefault("SLOW_REQUEST_MS", "60000")
+
+from benchmarks.common import app_client, percentiles, Timer
+from benchmarks.checkout import auth, fill_cart
+from core import database
+from core.inventory import sharded_stock
+
+
+async def round_trip(client, headers):
+    start = time.perf_counter()
+    r = await client.post("/orders/place", headers=headers)
+    return r.status_code, time.perf_counter() - start
+
+
+async def contention(client, shards, buyers, stock):
+    db = database.get_db()
+    product = await db["products"].insert_one(
+        {"name": f"Flash sale x{shards}", "price": 1.0, "in_stock": stock, "category": "Deals"}
+    )
+    pid = product.inserted_id
+    if shards > 1:
+        await sharded_stock.enable(pid, shards)
+
+    emails = [f"flash{shards}-{i}@example.com" for i in range(buyers)]
+    for email in emails:
+        await fill_cart(email, [pid], 1)
+    headers = [auth(e) for e in emails]
+
+    misses = sharded_stock.shard_misses
+    with Timer() as t:
+        results = await asyncio.gather(*(round_trip(client, h) for h in headers))
+    misses = sharded_stock.shard_misses - misses
+
+    placed = sum(status == 200 for status, _ in results)
+    if shards > 1:
+        await sharded_stock.disable(pid)
+    left = (await db["products"].find_one({"_id": pid}))["in_stock"]
+    p = percentiles([seconds for _, seconds in results])
+    ok = left >= 0 and placed + left == stock
+    print(f"{shards:>7} {buyers / t.elapsed:12.1f} {p['p50'] * 1000:9.1f} {p['p95'] * 1000:9.1f} "
+          f"{placed:>7} {left:>6} {misses:>8} {'ok' if ok else 'OVERSOLD'}")
+    return ok
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--buyers", type=int, default=300)
+    parser.add_argument("--stock", type=int, default=250)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 4, 16], help="1 = plain in_stock field")
+    args = parser.parse_args()
+
+    async with app_client() as client:
+        print(f"{'shards':>7} {'checkouts/s':>12} {'p50 ms':>9} {'p95 ms':>9} {'placed':>7} {'left':>6} {'misses':>8}")
+        ok = True
+        for shards in args.shards:
+            ok = await contention(client, shards, args.buyers, args.stock) and ok
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
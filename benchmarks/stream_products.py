@@ -0,0 +1,52 @@
+"""
+📦 GET /products/ — materialized response vs streaming mode.
+
+For each catalog size, reports time-to-first-byte, total time, response size
+and peak Python heap (tracemalloc) for the default endpoint and for
+`?stream=true` in both formats.
+
+    python -m benchmarks.stream_products --sizes 10000 100000 1000000 --batch-size 500
+"""
+import argparse
+import asyncio
+import tracemalloc
+
+from benchmarks.common import app_client, seed_products, asgi_get
+from core import database
+from routes.product_routes import catalog_cache
+
+
+async def measure(query: str):
+    catalog_cache.invalidate()
+    tracemalloc.start()
+    status, ttfb, total, size = await asgi_get("/products/", query)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert status == 200, status
+    return ttfb, total, size, peak
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    modes = {
+        "materialized": "",
+        "stream json": f"stream=true&batch_size={args.batch_size}",
+        "stream ndjson": f"stream=true&format=ndjson&batch_size={args.batch_size}",
+    }
+    print(f"{'products':>9} {'mode':>14} {'ttfb ms':>9} {'total ms':>9} {'MB out':>8} {'peak MB':>8}")
+    for size in args.sizes:
+        async with app_client():
+            await database.get_db()["products"].delete_many({})
+            await seed_products(size)
+            for label, query in modes.items():
+                ttfb, total, out, peak = await measure(query)
+                print(f"{size:>9} {label:>14} {ttfb * 1000:>9.1f} {total * 1000:>9.1f} "
+                      f"{out / 1e6:>8.1f} {peak / 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
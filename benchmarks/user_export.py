@@ -0,0 +1,60 @@
+"""
+📤 Admin user export: peak memory against user count.
+
+Seeds `--users` users per step and streams GET /auth/users/export, tracking
+peak Python allocations with tracemalloc while the response is consumed.
+The peak should stay roughly flat as the user count grows.
+
+mongomock materializes and sorts the whole collection in memory, so run
+against a real server to see the route's own footprint:
+
+    MONGO_BACKEND=motor MONGO_URI=mongodb://localhost:27017 DB_NAME=bench \\
+        python -m benchmarks.user_export --users 10000 50000
+"""
+import argparse
+import asyncio
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.common import app_client, asgi_get
+from core import database
+from core.security import create_token
+
+
+async def seed_users(count: int, start: int):
+    docs = [
+        {"email": f"user{i}@example.com", "password": "x", "role": "user",
+         "is_verified": True, "created_at": datetime.utcnow(), "name": f"User {i}"}
+        for i in range(start, start + count)
+    ]
+    for offset in range(0, len(docs), 10_000):
+        await database.get_db()["users"].insert_many(docs[offset:offset + 10_000])
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, nargs="+", default=[10_000, 50_000])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    headers = {"Authorization": f"Bearer {create_token('admin@example.com', 1, role='admin', verified=True)}"}
+
+    async with app_client():
+        await database.get_db()["users"].delete_many({})
+        seeded = 0
+        print(f"{'users':>7} {'format':>6} {'peak MB':>8} {'MB out':>7} {'seconds':>8}")
+        for total in sorted(args.users):
+            await seed_users(total - seeded, seeded)
+            seeded = total
+            for fmt in ("ndjson", "csv"):
+                tracemalloc.start()
+                status, _, seconds, size = await asgi_get(
+                    "/auth/users/export", f"format={fmt}&batch_size={args.batch_size}", headers
+                )
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                assert status == 200, status
+                print(f"{total:>7} {fmt:>6} {peak / 2**20:8.2f} {size / 2**20:7.2f} {seconds:8.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,32 @@
+"""
+📦 Shared helpers for the bulk cart/wishlist endpoints: every request is
+validated with one `$in` product lookup and answered with a per-item result
+list in request order.
+"""
+from bson import ObjectId
+from fastapi import HTTPException
+from .config import BULK_MAX_ITEMS
+from .database import products
+
+
+def check_size(count: int):
+    if count == 0:
+        raise HTTPException(status_code=400, detail="No items given")
+    if count > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_MAX_ITEMS} items per request")
+
+def valid_ids(product_ids) -> list:
+    """Distinct valid product ids, in first-seen order."""
+    return list(dict.fromkeys(pid for pid in product_ids if ObjectId.is_valid(pid)))
+
+async def products_by_id(product_ids: list, projection=None) -> dict:
+    """One `$in` fetch -> {product_id string: product}."""
+    if not product_ids:
+        return {}
+    found = await products.find(
+        {"_id": {"$in": [ObjectId(pid) for pid in product_ids]}}, projection
+    ).to_list(length=None)
+    return {str(p["_id"]): p for p in found}
+
+def result(product_id: str, status: str) -> dict:
+    return {"product_id": product_id, "status": status}
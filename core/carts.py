@@ -0,0 +1,141 @@
+"""
+🛒 One cart document per user:
+
+    {"_id": <user_email>,
+     "items": {<product_id>: {"name", "price", "quantity"}},
+     "updated_at": <datetime>}
+
+Every mutation is a single atomic update/upsert on that document, so
+concurrent clicks cannot create duplicate lines, and checkout reads the whole
+cart in one round trip.
+"""
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from .database import carts
+
+
+def _path(product_id: str) -> str:
+    # product_id becomes part of a field path, so it must be a plain ObjectId hex string
+    if not ObjectId.is_valid(product_id):
+        raise ValueError(f"Invalid product ID: {product_id}")
+    return f"items.{product_id}"
+
+def line_items(cart: dict) -> list:
+    """Cart document -> list of {"product_id", "name", "price", "quantity"}."""
+    if not cart:
+        return []
+    return [{"product_id": pid, **line} for pid, line in cart.get("items", {}).items()]
+
+
+async def get_cart(user_email: str) -> dict:
+    return await carts.find_one({"_id": user_email}) or {"_id": user_email, "items": {}}
+
+def _add_update(product: dict, quantity: int) -> dict:
+    path = _path(str(product["_id"]))
+    return {
+        "$inc": {f"{path}.quantity": quantity},
+        "$set": {f"{path}.name": product["name"], f"{path}.price": product["price"]},
+        "$currentDate": {"updated_at": True},
+    }
+
+async def add_item(user_email: str, product: dict, quantity: int = 1):
+    """Add `quantity` of `product` (inserting the line or bumping it) and refresh the price snapshot."""
+    await carts.update_one({"_id": user_email}, _add_update(product, quantity), upsert=True)
+
+def add_item_op(user_email: str, product: dict, quantity: int = 1) -> UpdateOne:
+    """Same as add_item, as a bulk_write operation."""
+    return UpdateOne({"_id": user_email}, _add_update(product, quantity), upsert=True)
+
+async def add_items(user_email: str, lines: list):
+    """Add several (product, quantity) lines in one atomic update of the cart document."""
+    update = {"$inc": {}, "$set": {}, "$currentDate": {"updated_at": True}}
+    for product, quantity in lines:
+        part = _add_update(product, quantity)
+        update["$inc"].update(part["$inc"])
+        update["$set"].update(part["$set"])
+    await carts.update_one({"_id": user_email}, update, upsert=True)
+
+async def set_quantity(user_email: str, product_id: str, quantity: int) -> bool:
+    path = _path(product_id)
+    result = await carts.update_one(
+        {"_id": user_email, path: {"$exists": True}},
+        {"$set": {f"{path}.quantity": quantity}, "$currentDate": {"updated_at": True}}
+    )
+    return result.matched_count > 0
+
+async def remove_item(user_email: str, product_id: str) -> bool:
+    path = _path(product_id)
+    result = await carts.update_one(
+        {"_id": user_email, path: {"$exists": True}},
+        {"$unset": {path: ""}, "$currentDate": {"updated_at": True}}
+    )
+    return result.matched_count > 0
+
+async def remove_items(user_email: str, product_ids: list) -> set:
+    """Remove several lines in one update; returns the product ids that were in the cart."""
+    before = await carts.find_one_and_update(
+        {"_id": user_email},
+        {"$unset": {_path(pid): "" for pid in product_ids}, "$currentDate": {"updated_at": True}},
+        projection={_path(pid): 1 for pid in product_ids},
+        return_document=ReturnDocument.BEFORE
+    )
+    return set(before.get("items", {})) if before else set()
+
+async def clear(user_email: str):
+    await carts.delete_one({"_id": user_email})
+
+async def consume(user_email: str, quantities: dict, session=None):
+    """
+    Take an order's {product_id: quantity} out of the cart. Quantities are
+    decremented rather than the lines removed, so units added between
+    checkout's cart read and this update stay in the cart; lines that reach
+    zero are then dropped.
+    """
+    await carts.update_one(
+        {"_id": user_email},
+        {"$inc": {f"{_path(pid)}.quantity": -qty for pid, qty in quantities.items()},
+         "$currentDate": {"updated_at": True}},
+        session=session
+    )
+    await carts.bulk_write([
+        UpdateOne({"_id": user_email, f"{_path(pid)}.quantity": {"$lte": 0}}, {"$unset": {_path(pid): ""}})
+        for pid in quantities
+    ], ordered=False, session=session)
+
+
+# ---------------------- MIGRATION FROM ONE-ROW-PER-LINE ----------------------
+async def migrate_cart_lines(db, batch_size=1000) -> int:
+    """
+    Fold legacy `cart` rows into `carts` documents, deleting each batch once merged.
+
+    Safe to re-run or run twice at once: each fold only applies while the
+    cart does not list the row's id in `migrated_lines`, and records it in
+    the same update, so a row is never counted twice. The markers are
+    dropped once every legacy row is gone.
+    """
+    moved = 0
+    ops, ids = [], []
+
+    async def flush():
+        nonlocal moved, ops, ids
+        if ops:
+            await db["carts"].bulk_write(ops, ordered=True)
+        await db["cart"].delete_many({"_id": {"$in": ids}})
+        moved += len(ids)
+        ops, ids = [], []
+
+    async for row in db["cart"].find({}):
+        ids.append(row["_id"])
+        if ObjectId.is_valid(row.get("product_id", "")):
+            product = {"_id": row["product_id"], "name": row.get("name"), "price": row.get("price")}
+            update = _add_update(product, row.get("quantity", 1))
+            update["$addToSet"] = {"migrated_lines": row["_id"]}
+            ops.append(UpdateOne({"_id": row["user_email"]}, {"$setOnInsert": {"items": {}}}, upsert=True))
+            ops.append(UpdateOne({"_id": row["user_email"], "migrated_lines": {"$ne": row["_id"]}}, update))
+        if len(ids) >= batch_size:
+            await flush()
+    if ids:
+        await flush()
+    if not await db["cart"].find_one({}, {"_id": 1}):
+        await db["carts"].update_many({"migrated_lines": {"$exists": True}}, {"$unset": {"migrated_lines": ""}})
+    return moved
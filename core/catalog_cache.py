@@ -0,0 +1,50 @@
+import time
+from .config import CATALOG_CACHE_SIZE, CATALOG_CACHE_TTL
+from .lru import LRUCache
+
+
+class CatalogCache:
+    """
+    📦 Read-through cache for product catalog reads.
+
+    Holds the whole-catalog snapshot and per-query results (keyed by the
+    normalized filter tuple) in one size-bounded LRU. Anything that changes
+    what the catalog shows calls `invalidate()`, which bumps the version so
+    every older entry is dropped at once: admin product writes, a
+    checkout's stock decrements (or their rollback) and a sharded-stock
+    aggregation that moved a total. A load that started before an
+    invalidation is not stored.
+
+    `ttl` bounds staleness for writes made by other worker processes.
+    """
+
+    def __init__(self, max_entries=512, ttl=30.0, clock=time.monotonic):
+        self.version = 0
+        self._entries = LRUCache(max_entries, ttl=ttl, clock=clock)
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def put(self, key, value, version=None):
+        if version is not None and version != self.version:
+            return
+        self._entries.put(key, value)
+
+    async def get_or_load(self, key, loader):
+        value = self.get(key)
+        if value is not None:
+            return value
+        version = self.version
+        value = await loader()
+        self.put(key, value, version=version)
+        return value
+
+    def invalidate(self):
+        self.version += 1
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {**self._entries.stats(), "version": self.version}
+
+
+catalog_cache = CatalogCache(max_entries=CATALOG_CACHE_SIZE, ttl=CATALOG_CACHE_TTL)
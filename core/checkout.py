@@ -0,0 +1,207 @@
+from collections import OrderedDict
+from datetime import datetime
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import UpdateOne
+from . import database
+from .database import orders_collection, products
+from . import carts, rollups
+from .pricing import price_cache
+from .catalog_cache import catalog_cache
+from .inventory import sharded_stock
+
+
+# Order line items are stored as exactly these fields; category is the product's at
+# checkout (orders placed before it was captured lack it)
+ITEM_FIELDS = ("product_id", "name", "price", "quantity", "category")
+
+
+class InsufficientStock(Exception):
+    def __init__(self, name):
+        super().__init__(name)
+        self.name = name
+
+
+def _order_lines(cart_items):
+    """Cart lines -> OrderedDict[ObjectId, quantity]."""
+    lines = OrderedDict()
+    for item in cart_items:
+        pid = ObjectId(item["product_id"])
+        lines[pid] = lines.get(pid, 0) + item["quantity"]
+    return lines
+
+
+async def _load_products(lines):
+    """One $in fetch; raises 404/400 before any write for missing or short products."""
+    found = await products.find(
+        {"_id": {"$in": list(lines)}}, {"name": 1, "price": 1, "in_stock": 1, "category": 1, "stock_shards": 1}
+    ).to_list(length=None)
+    by_id = {p["_id"]: p for p in found}
+    for pid, qty in lines.items():
+        product = by_id.get(pid)
+        if not product:
+            raise HTTPException(status_code=404, detail=f"Product {pid} not found")
+        # Sharded products only have an aggregated (slightly stale) total; their shard take decides
+        if "stock_shards" not in product and product["in_stock"] < qty:
+            raise HTTPException(status_code=400, detail=f"Insufficient stock for {product['name']}")
+    return by_id
+
+
+def _decrements(lines, hold=None):
+    ops = []
+    for pid, qty in lines.items():
+        update = {"$inc": {"in_stock": -qty}}
+        if hold is not None:
+            update["$push"] = {"stock_holds": hold}
+        # Guarded: only decrements while enough stock is left, and never a product
+        # whose stock moved into shard counters after it was loaded
+        ops.append(UpdateOne({"_id": pid, "in_stock": {"$gte": qty}, "stock_shards": {"$exists": False}}, update))
+    return ops
+
+
+def _split_lines(lines, by_id):
+    """(plain lines, sharded lines): sharded products are decremented through core.inventory."""
+    plain, sharded = OrderedDict(), OrderedDict()
+    for pid, qty in lines.items():
+        (sharded if "stock_shards" in by_id[pid] else plain)[pid] = qty
+    return plain, sharded
+
+
+async def _take_sharded(sharded, by_id, session=None) -> list:
+    """Guarded shard decrements; on a shortfall gives back what was taken and raises."""
+    taken = []
+    for pid, qty in sharded.items():
+        got = await sharded_stock.take(pid, by_id[pid]["stock_shards"], qty, session=session)
+        if got is None:
+            await sharded_stock.release(taken, session=session)
+            raise InsufficientStock(by_id[pid]["name"])
+        taken += got
+    return taken
+
+
+async def _checkout_in_transaction(order, lines, by_id):
+    plain, sharded = _split_lines(lines, by_id)
+
+    async def run(session):
+        if plain:
+            result = await products.bulk_write(_decrements(plain), ordered=False, session=session)
+            if result.modified_count != len(plain):
+                raise InsufficientStock(_first_short(by_id, plain))
+        await _take_sharded(sharded, by_id, session=session)
+        await orders_collection.insert_one(order, session=session)
+        await carts.consume(order["user_email"], {str(pid): qty for pid, qty in lines.items()}, session=session)
+
+    async with await database.current_db().client.start_session() as session:
+        await session.with_transaction(run)
+
+
+async def _checkout_with_compensation(order, lines, by_id):
+    """
+    For deployments without transactions: every guarded decrement also records
+    the order id in `stock_holds`, so if any line falls short the decrements
+    that did land can be found and reversed exactly. Shard takes for sharded
+    products are given back directly.
+    """
+    hold = order["_id"]
+    plain, sharded = _split_lines(lines, by_id)
+
+    async def restore_plain():
+        await products.bulk_write([
+            UpdateOne({"_id": pid, "stock_holds": hold}, {"$inc": {"in_stock": qty}, "$pull": {"stock_holds": hold}})
+            for pid, qty in plain.items()
+        ], ordered=False)
+        # A catalog read between the decrement and this rollback may have cached the lower stock
+        catalog_cache.invalidate()
+
+    if plain:
+        result = await products.bulk_write(_decrements(plain, hold=hold), ordered=False)
+        if result.modified_count != len(plain):
+            await restore_plain()
+            raise InsufficientStock(_first_short(by_id, plain))
+    try:
+        await _take_sharded(sharded, by_id)
+    except InsufficientStock:
+        if plain:
+            await restore_plain()
+        raise
+
+    await orders_collection.insert_one(order)
+    if plain:
+        await products.update_many({"_id": {"$in": list(plain)}}, {"$pull": {"stock_holds": hold}})
+    await carts.consume(order["user_email"], {str(pid): qty for pid, qty in lines.items()})
+
+
+def _first_short(by_id, lines):
+    # The bulk result does not say which line lost the race; name the first one
+    return by_id[next(iter(lines))]["name"] if len(lines) == 1 else "one or more items"
+
+
+async def place_order(user_email: str) -> dict:
+    """
+    🧾 Checkout in a fixed number of round trips regardless of cart size:
+    cart read, one $in product fetch, one bulk_write of guarded decrements,
+    order insert, cart update. Stock can never go negative; a shortfall on any
+    line rolls the whole checkout back (transaction or compensation).
+    Lines are charged at the current product price, not the cart snapshot.
+    """
+    cart_items = carts.line_items(await carts.get_cart(user_email))
+    if not cart_items:
+        raise HTTPException(status_code=400, detail="Cart is empty")
+
+    lines = _order_lines(cart_items)
+    by_id = await _load_products(lines)
+
+    items = [
+        {"product_id": str(pid), "name": by_id[pid]["name"], "price": by_id[pid]["price"], "quantity": qty,
+         "category": by_id[pid].get("category") or rollups.UNCATEGORIZED}
+        for pid, qty in lines.items()
+    ]
+    order = {
+        "_id": ObjectId(),
+        "user_email": user_email,
+        "items": items,
+        "item_count": len(items),
+        "total_amount": round(sum(i["price"] * i["quantity"] for i in items), 2),
+        "status": "Delivered",
+        "created_at": datetime.utcnow(),
+    }
+    try:
+        if database.supports_transactions:
+            await _checkout_in_transaction(order, lines, by_id)
+        else:
+            await _checkout_with_compensation(order, lines, by_id)
+    except InsufficientStock as e:
+        raise HTTPException(status_code=400, detail=f"Insufficient stock for {e.name}")
+    price_cache.discard(map(str, lines))
+    if any("stock_shards" not in by_id[pid] for pid in lines):
+        # in_stock is part of cached listings; sharded totals are refreshed by the aggregator
+        catalog_cache.invalidate()
+    await rollups.record_safely(order, relabel=True)
+    return order
+
+
+# ---------------------- MIGRATION TO COMPACT LINE ITEMS ----------------------
+def compact_items(items: list) -> list:
+    """Legacy order items (raw cart rows with _id, user_email, ...) -> ITEM_FIELDS only (no category)."""
+    return [
+        {"product_id": str(item["product_id"]), "name": item.get("name"),
+         "price": item.get("price"), "quantity": item.get("quantity", 1)}
+        for item in items
+    ]
+
+async def migrate_order_items(db, batch_size=1000) -> int:
+    """Rewrite orders placed before compact line items and backfill `item_count`. Returns the number updated."""
+    updated = 0
+    batch = []
+    query = {"$or": [{"item_count": {"$exists": False}}, {"items._id": {"$exists": True}}]}
+    async for order in db["orders"].find(query, {"items": 1}):
+        items = compact_items(order.get("items", []))
+        batch.append(UpdateOne({"_id": order["_id"]}, {"$set": {"items": items, "item_count": len(items)}}))
+        if len(batch) >= batch_size:
+            await db["orders"].bulk_write(batch, ordered=False)
+            updated += len(batch)
+            batch = []
+    if batch:
+        await db["orders"].bulk_write(batch, ordered=False)
+        updated += len(batch)
+    return updated
@@ -1,5 +1,4 @@
 import os
-from pymongo import MongoClient
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -7,15 +6,58 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "fallback_secret_key")
 ALGORITHM = "HS256"
 MONGO_URI = os.getenv("MONGO_URI")
+MONGO_BACKEND = os.getenv("MONGO_BACKEND", "motor")  # "motor" or "memory"
+DB_NAME = os.getenv("DB_NAME", "userdb")
+# Connection pool and driver options; unset values keep the driver defaults
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+MONGO_MAX_IDLE_TIME_MS = os.getenv("MONGO_MAX_IDLE_TIME_MS")
+MONGO_WAIT_QUEUE_TIMEOUT_MS = os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS")
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 10000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 10000))
+MONGO_SOCKET_TIMEOUT_MS = os.getenv("MONGO_SOCKET_TIMEOUT_MS")
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "")  # e.g. "zstd,snappy,zlib"
+MONGO_READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE", "primary")
+MONGO_READ_CONCERN = os.getenv("MONGO_READ_CONCERN")  # e.g. "majority"
+MONGO_WRITE_CONCERN = os.getenv("MONGO_WRITE_CONCERN")  # e.g. "majority" or "1"
+MONGO_WRITE_TIMEOUT_MS = os.getenv("MONGO_WRITE_TIMEOUT_MS")
+HEALTH_PING_TIMEOUT = float(os.getenv("HEALTH_PING_TIMEOUT", 2))
 EMAIL_SENDER = os.getenv("EMAIL_SENDER")
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
+SMTP_BACKEND = os.getenv("SMTP_BACKEND", "smtp")  # "smtp" or "local"
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", 465))
+SMTP_USE_SSL = os.getenv("SMTP_USE_SSL", "true").lower() == "true"
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", 2))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 20))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 5))
+OUTBOX_CLAIM_LEASE = int(os.getenv("OUTBOX_CLAIM_LEASE", 300))  # seconds before an unfinished send is retried
+MX_CACHE_TTL = int(os.getenv("MX_CACHE_TTL", 3600))
+MX_NEGATIVE_TTL = int(os.getenv("MX_NEGATIVE_TTL", 300))
+MX_CACHE_SIZE = int(os.getenv("MX_CACHE_SIZE", 10000))
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "process")  # "process" or "thread"
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", 64))
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", 10000))
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", 512))
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", 30))
+PRICE_CACHE_SIZE = int(os.getenv("PRICE_CACHE_SIZE", 10000))
+PRICE_CACHE_TTL = float(os.getenv("PRICE_CACHE_TTL", 5))
+SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", 5000))  # matches ranked per search
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", 100))
+STOCK_AGGREGATE_INTERVAL = float(os.getenv("STOCK_AGGREGATE_INTERVAL", 2))
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", 86400))  # how long responses are replayed
+IDEMPOTENCY_WAIT = float(os.getenv("IDEMPOTENCY_WAIT", 10))  # duplicate waits this long for the first request
+IDEMPOTENCY_LOCK_TTL = int(os.getenv("IDEMPOTENCY_LOCK_TTL", 60))  # unfinished claims can be taken over after this
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", 500))
+THROTTLE_BACKEND = os.getenv("THROTTLE_BACKEND", "memory")  # "memory" or "mongo"
+THROTTLE_MAX_KEYS = int(os.getenv("THROTTLE_MAX_KEYS", 100000))
+# "<attempts>/<seconds>" per client IP or per account; "0" disables a limit
+THROTTLE_LOGIN_PER_IP = os.getenv("THROTTLE_LOGIN_PER_IP", "30/60")
+THROTTLE_LOGIN_PER_ACCOUNT = os.getenv("THROTTLE_LOGIN_PER_ACCOUNT", "10/300")
+THROTTLE_REGISTER_PER_IP = os.getenv("THROTTLE_REGISTER_PER_IP", "10/3600")
+THROTTLE_REGISTER_PER_ACCOUNT = os.getenv("THROTTLE_REGISTER_PER_ACCOUNT", "3/3600")
+THROTTLE_FORGOT_PER_IP = os.getenv("THROTTLE_FORGOT_PER_IP", "10/3600")
+THROTTLE_FORGOT_PER_ACCOUNT = os.getenv("THROTTLE_FORGOT_PER_ACCOUNT", "3/3600")
 TOKEN_EXPIRE_HOURS = int(os.getenv("VERIFICATION_TOKEN_EXPIRE_HOURS", 1))
-
-client = MongoClient(MONGO_URI)
-db = client["userdb"]
-users = db["users"]
-products = db["products"]
-wishlist_collection = db["wishlist"]
-cart_collection = db["cart"]
-orders_collection = db["orders"]
-token_blacklist = db["token_blacklist"]
@@ -0,0 +1,170 @@
+import asyncio
+import contextvars
+import time
+from fastapi import Depends
+from motor.motor_asyncio import AsyncIOMotorClient
+from .config import (
+    MONGO_URI, MONGO_BACKEND, DB_NAME, MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_TIME_MS,
+    MONGO_WAIT_QUEUE_TIMEOUT_MS, MONGO_CONNECT_TIMEOUT_MS, MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    MONGO_SOCKET_TIMEOUT_MS, MONGO_COMPRESSORS, MONGO_READ_PREFERENCE, MONGO_READ_CONCERN,
+    MONGO_WRITE_CONCERN, MONGO_WRITE_TIMEOUT_MS, HEALTH_PING_TIMEOUT,
+)
+from .metrics import command_listener, pool_listener
+
+client = None
+db = None
+supports_transactions = False
+_request_db = contextvars.ContextVar("request_db", default=None)
+
+
+def client_options() -> dict:
+    """Motor client keyword arguments from the MONGO_* settings; unset options keep the driver default."""
+    options = {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "event_listeners": [command_listener, pool_listener],
+    }
+    for key, value in (
+        ("maxIdleTimeMS", MONGO_MAX_IDLE_TIME_MS),
+        ("waitQueueTimeoutMS", MONGO_WAIT_QUEUE_TIMEOUT_MS),
+        ("socketTimeoutMS", MONGO_SOCKET_TIMEOUT_MS),
+    ):
+        if value:
+            options[key] = int(value)
+    if MONGO_COMPRESSORS:
+        options["compressors"] = MONGO_COMPRESSORS
+    # Read/write concerns become the defaults for every database and collection handle
+    options["readPreference"] = MONGO_READ_PREFERENCE
+    if MONGO_READ_CONCERN:
+        options["readConcernLevel"] = MONGO_READ_CONCERN
+    if MONGO_WRITE_CONCERN:
+        options["w"] = int(MONGO_WRITE_CONCERN) if MONGO_WRITE_CONCERN.isdigit() else MONGO_WRITE_CONCERN
+    if MONGO_WRITE_TIMEOUT_MS:
+        options["wTimeoutMS"] = int(MONGO_WRITE_TIMEOUT_MS)
+    return options
+
+
+async def connect():
+    """
+    🔌 Create the async Mongo client (called from the app lifespan hook, so
+    importing the app never opens a connection). MONGO_BACKEND=memory swaps
+    in an in-memory mongomock store for tests.
+    """
+    global client, db, supports_transactions
+    if client is not None:
+        return db
+
+    if MONGO_BACKEND == "memory":
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+        supports_transactions = False
+        db = client[DB_NAME]
+    else:
+        client = AsyncIOMotorClient(MONGO_URI, **client_options())
+        # Multi-document transactions need a replica set or a sharded cluster
+        hello = await client.admin.command("hello")
+        supports_transactions = "setName" in hello or hello.get("msg") == "isdbgrid"
+        db = client[DB_NAME]
+
+    return db
+
+
+async def ping() -> float:
+    """Round trip to the server in milliseconds; raises on failure or after HEALTH_PING_TIMEOUT seconds."""
+    start = time.perf_counter()
+    await asyncio.wait_for(get_db().command("ping"), timeout=HEALTH_PING_TIMEOUT)
+    return (time.perf_counter() - start) * 1000
+
+
+def pool_stats() -> dict:
+    """
+    Pool utilization summed over all servers; zeros for the in-memory backend.
+    Only aggregates, since /health is public: the per-server breakdown (keyed
+    by host:port) is in the admin-only /metrics.
+    """
+    servers = pool_listener.stats()
+    in_use = sum(server["in_use"] for server in servers.values())
+    return {
+        "max_pool_size": MONGO_MAX_POOL_SIZE,
+        "min_pool_size": MONGO_MIN_POOL_SIZE,
+        "in_use": in_use,
+        "waiting": sum(server["waiting"] for server in servers.values()),
+        "utilization": in_use / (MONGO_MAX_POOL_SIZE * len(servers)) if servers and MONGO_MAX_POOL_SIZE else 0.0,
+        "servers": len(servers),
+    }
+
+
+def close():
+    global client, db
+    if client is not None:
+        client.close()
+    client = None
+    db = None
+
+
+def get_db():
+    if db is None:
+        raise RuntimeError("Database not connected. Call core.database.connect() first.")
+    return db
+
+def current_db():
+    """The database bound to the request being served (see `bind_database`), else the connected one."""
+    bound = _request_db.get()
+    return bound if bound is not None else get_db()
+
+
+# ---------------------- DEPENDENCIES ----------------------
+def get_database():
+    """
+    FastAPI dependency for the current database. Override it with
+    `app.dependency_overrides[get_database]` to hand routes a stand-in;
+    `bind_database` carries the override to the LazyCollection handles that
+    core modules (carts, checkout, bulk, pricing, ...) use.
+    """
+    return get_db()
+
+async def bind_database(database=Depends(get_database)):
+    """App-wide dependency: LazyCollection handles resolve against `database` for the rest of the request."""
+    _request_db.set(database)
+
+def collection(name: str):
+    """Dependency factory: `products=Depends(collection("products"))`."""
+    def dependency(database=Depends(get_database)):
+        return database[name]
+    dependency.__name__ = f"{name}_collection"
+    return dependency
+
+
+class LazyCollection:
+    """
+    Handle to a collection on the current database (`current_db()`),
+    resolved on every access so routers can import it at module level before
+    the lifespan hook connects.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(current_db()[self.name], attr)
+
+    def __repr__(self):
+        return f"LazyCollection({self.name!r})"
+
+
+users = LazyCollection("users")
+products = LazyCollection("products")
+stock_shards = LazyCollection("stock_shards")  # per-product stock counters, see core.inventory
+wishlist_collection = LazyCollection("wishlist")
+cart_collection = LazyCollection("cart")  # legacy one-row-per-line layout, see core.carts
+carts = LazyCollection("carts")
+orders_collection = LazyCollection("orders")
+token_blacklist = LazyCollection("token_blacklist")
+email_outbox = LazyCollection("email_outbox")
+rate_limits = LazyCollection("rate_limits")
+idempotency_keys = LazyCollection("idempotency_keys")
+sales_daily = LazyCollection("sales_daily")
+sales_by_product = LazyCollection("sales_by_product")
+sales_by_category = LazyCollection("sales_by_category")
@@ -1,23 +1,181 @@
-import smtplib, ssl, dns.resolver
+import asyncio, smtplib, ssl, time, dns.resolver, dns.asyncresolver
 from email.message import EmailMessage
-from .config import EMAIL_SENDER, EMAIL_PASSWORD
+from .config import EMAIL_SENDER, EMAIL_PASSWORD, SMTP_HOST, SMTP_PORT, SMTP_USE_SSL
+from .config import MX_CACHE_TTL, MX_NEGATIVE_TTL, MX_CACHE_SIZE
+from .lru import LRUCache
 
-def validate_email_exists(email: str) -> bool:
+_NO_MX_ERRORS = (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer, dns.resolver.NoNameservers)
+
+
+async def resolve_mx(domain: str) -> bool:
+    """Default async resolver. Missing domains/records return False; timeouts raise and are not cached."""
+    try:
+        records = await dns.asyncresolver.resolve(domain, 'MX')
+        return len(records) > 0
+    except _NO_MX_ERRORS:
+        return False
+
+
+def resolve_mx_sync(domain: str) -> bool:
     try:
-        domain = email.split('@')[1]
         records = dns.resolver.resolve(domain, 'MX')
         return len(records) > 0
-    except Exception:
+    except _NO_MX_ERRORS:
         return False
 
-def send_email(recipient: str, subject: str, text_body: str, html_body: str):
+
+class MXCache:
+    """
+    📮 Domain-level MX lookup cache.
+
+    - Positive and negative results expire after their own TTLs
+    - Bounded size with LRU eviction
+    - Concurrent async lookups for the same domain share one DNS query
+    - `resolver` / `sync_resolver` are pluggable (domain -> bool) for offline tests
+    """
+
+    def __init__(self, resolver=resolve_mx, sync_resolver=resolve_mx_sync, positive_ttl=MX_CACHE_TTL,
+                 negative_ttl=MX_NEGATIVE_TTL, max_size=MX_CACHE_SIZE, clock=time.monotonic):
+        self.resolver = resolver
+        self.sync_resolver = sync_resolver
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self._entries = LRUCache(max_size, clock=clock)  # domain -> has_mx
+        self._inflight = {}
+        self.coalesced = 0
+
+    def _put(self, domain, has_mx):
+        self._entries.put(domain, has_mx, ttl=self.positive_ttl if has_mx else self.negative_ttl)
+
+    async def has_mx(self, domain: str) -> bool:
+        domain = domain.lower()
+        cached = self._entries.get(domain)
+        if cached is not None:
+            return cached
+
+        pending = self._inflight.get(domain)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[domain] = future
+        try:
+            has_mx = await self.resolver(domain)
+            self._put(domain, has_mx)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception:
+            has_mx = False
+        finally:
+            del self._inflight[domain]
+        future.set_result(has_mx)
+        return has_mx
+
+    def has_mx_sync(self, domain: str) -> bool:
+        domain = domain.lower()
+        cached = self._entries.get(domain)
+        if cached is not None:
+            return cached
+
+        try:
+            has_mx = self.sync_resolver(domain)
+        except Exception:
+            return False
+        self._put(domain, has_mx)
+        return has_mx
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        # Lookups that joined an in-flight query count as coalesced, not as misses
+        return {
+            "hits": self._entries.hits,
+            "misses": self._entries.misses - self.coalesced,
+            "coalesced": self.coalesced,
+            "size": len(self._entries),
+        }
+
+
+mx_cache = MXCache()
+
+
+def _domain_of(email: str):
+    _, sep, domain = email.rpartition('@')
+    return domain if sep and domain else None
+
+def validate_email_exists(email: str) -> bool:
+    domain = _domain_of(email)
+    return mx_cache.has_mx_sync(domain) if domain else False
+
+async def validate_email_exists_async(email: str) -> bool:
+    domain = _domain_of(email)
+    return await mx_cache.has_mx(domain) if domain else False
+
+def build_message(recipient: str, subject: str, text_body: str, html_body: str) -> EmailMessage:
     msg = EmailMessage()
     msg["Subject"] = subject
     msg["From"] = EMAIL_SENDER
     msg["To"] = recipient
     msg.set_content(text_body)
     msg.add_alternative(html_body, subtype="html")
+    return msg
+
+def send_email(recipient: str, subject: str, text_body: str, html_body: str):
+    """Send one message immediately on a fresh connection. Request handlers should use core.outbox instead."""
+    with SMTPTransport().connect() as smtp:
+        smtp.send_message(build_message(recipient, subject, text_body, html_body))
+
+
+class SMTPTransport:
+    """Opens authenticated connections to the configured SMTP server."""
+
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, use_ssl=SMTP_USE_SSL,
+                 username=EMAIL_SENDER, password=EMAIL_PASSWORD, timeout=30):
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+
+    def connect(self):
+        if self.use_ssl:
+            smtp = smtplib.SMTP_SSL(self.host, self.port, context=ssl.create_default_context(), timeout=self.timeout)
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.username and self.password:
+            smtp.login(self.username, self.password)
+        return smtp
+
+
+class LocalMailbox:
+    """
+    📭 In-memory SMTP stand-in: "connections" append to `sent` instead of
+    talking to a server. Set SMTP_BACKEND=local to use it.
+    """
+
+    def __init__(self):
+        self.sent = []
+        self.connections_opened = 0
+
+    def connect(self):
+        self.connections_opened += 1
+        return self
+
+    def send_message(self, msg):
+        self.sent.append(msg)
+
+    def noop(self):
+        return (250, b"OK")
+
+    def quit(self):
+        pass
+
+    def __enter__(self):
+        return self
 
-    with smtplib.SMTP_SSL("smtp.gmail.com", 465, context=ssl.create_default_context()) as smtp:
-        smtp.login(EMAIL_SENDER, EMAIL_PASSWORD)
-        smtp.send_message(msg)
+    def __exit__(self, *exc):
+        self.quit()
@@ -0,0 +1,196 @@
+"""
+🔁 `Idempotency-Key` support for retried mutations.
+
+The first request with a given key (per user) claims it by inserting
+{"_id": "<user>:<key>", "status": "pending"} into `idempotency_keys`, runs
+the handler and stores its response. Later requests with the same key get
+that stored response back without re-executing. A duplicate that arrives
+while the first is still running waits for it: on an in-process future
+when both hit the same worker, otherwise by polling the record, for up to
+IDEMPOTENCY_WAIT seconds before a 409.
+
+Responses with status < 500 (including 4xx errors) are stored for
+IDEMPOTENCY_TTL seconds; a TTL index on `expires_at` removes them. Server
+errors from the handler release the key so the client can retry. While
+the handler runs, its worker keeps pushing the claim's `expires_at`
+IDEMPOTENCY_LOCK_TTL ahead, so a slow handler is neither taken over nor
+removed by the TTL index. A claim whose worker died stops being extended
+and is taken over once the lock TTL lapses. A successful handler's key is
+not released, but if storing its response keeps failing the claim is left
+pending like a dead worker's: a retry after the lock TTL runs it again.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
+from .config import IDEMPOTENCY_TTL, IDEMPOTENCY_WAIT, IDEMPOTENCY_LOCK_TTL
+from .database import idempotency_keys
+from .responses import BSONResponse
+
+logger = logging.getLogger(__name__)
+
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.05
+STORE_ATTEMPTS = 3
+
+
+class IdempotencyStore:
+    def __init__(self, collection, ttl=IDEMPOTENCY_TTL, wait=IDEMPOTENCY_WAIT, lock_ttl=IDEMPOTENCY_LOCK_TTL):
+        self.collection = collection
+        self.ttl = ttl
+        self.wait = wait
+        self.lock_ttl = lock_ttl
+        self._in_flight = {}  # record id -> future resolved with the stored response
+        self.executed = 0
+        self.replayed = 0
+        self.waited = 0
+        self.conflicts = 0
+
+    async def execute(self, user_email: str, key, endpoint: str, handler):
+        """
+        Run `handler()` (returning a JSON-serializable body) at most once per
+        (user, key). `endpoint` identifies the request ("POST /cart/add/<id>");
+        reusing a key for a different endpoint is a 422.
+        """
+        if key is None:
+            return await handler()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+
+        record_id = f"{user_email}:{key}"
+        while True:
+            if await self._claim(record_id, endpoint):
+                return await self._run(record_id, handler)
+            record = await self._wait_for(record_id)
+            if record is None:
+                continue  # the first attempt failed and released the key: claim it ourselves
+            if record["endpoint"] != endpoint:
+                raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+            if record["status"] == "pending":
+                self.conflicts += 1
+                raise HTTPException(
+                    status_code=409,
+                    detail="A request with this Idempotency-Key is still in progress",
+                    headers={"Retry-After": "1"},
+                )
+            self.replayed += 1
+            return self._replay(record["response"])
+
+    async def _claim(self, record_id: str, endpoint: str) -> bool:
+        now = datetime.utcnow()
+        try:
+            await self.collection.insert_one({
+                "_id": record_id, "endpoint": endpoint, "status": "pending",
+                "created_at": now, "expires_at": now + timedelta(seconds=self.lock_ttl),
+            })
+            return True
+        except DuplicateKeyError:
+            pass
+        # Take over a claim whose worker died before finishing (the TTL monitor may not have run yet)
+        stale = await self.collection.find_one_and_update(
+            {"_id": record_id, "endpoint": endpoint, "status": "pending", "expires_at": {"$lt": now}},
+            {"$set": {"created_at": now, "expires_at": now + timedelta(seconds=self.lock_ttl)}},
+        )
+        return stale is not None
+
+    async def _run(self, record_id: str, handler):
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[record_id] = future
+        lease = asyncio.create_task(self._extend_lease(record_id))
+        try:
+            try:
+                body = await handler()
+                response = {"status_code": 200, "body": body}
+            except HTTPException as e:
+                if e.status_code >= 500:
+                    raise
+                response = {"status_code": e.status_code, "body": {"detail": e.detail}}
+            finally:
+                lease.cancel()
+                await asyncio.gather(lease, return_exceptions=True)
+        except BaseException:
+            # Only a failed handler releases the key for a retry
+            try:
+                await self.collection.delete_one({"_id": record_id, "status": "pending"})
+            finally:
+                self._in_flight.pop(record_id, None)
+                future.set_result(None)
+            raise
+
+        try:
+            await self._store(record_id, response)
+        finally:
+            self._in_flight.pop(record_id, None)
+            future.set_result(response)
+        self.executed += 1
+        if response["status_code"] != 200:
+            raise HTTPException(status_code=response["status_code"], detail=response["body"]["detail"])
+        return body
+
+    async def _extend_lease(self, record_id: str):
+        """Keep a pending claim from lapsing while its handler is still running."""
+        while True:
+            await asyncio.sleep(self.lock_ttl / 3)
+            try:
+                await self.collection.update_one(
+                    {"_id": record_id, "status": "pending"},
+                    {"$set": {"expires_at": datetime.utcnow() + timedelta(seconds=self.lock_ttl)}},
+                )
+            except Exception:
+                # Beats come every third of the TTL, so two more get a chance before it lapses
+                logger.warning("Could not extend the claim on Idempotency-Key %s", record_id)
+
+    async def _store(self, record_id: str, response: dict):
+        """
+        Record the handler's response, retrying a failed write. The handler's
+        side effects are committed, so if every attempt fails the claim is
+        left pending until the lock TTL lapses instead of being released at once.
+        """
+        for attempt in range(STORE_ATTEMPTS):
+            try:
+                await self.collection.update_one({"_id": record_id}, {"$set": {
+                    "status": "done", "response": response,
+                    "expires_at": datetime.utcnow() + timedelta(seconds=self.ttl),
+                }})
+                return
+            except Exception:
+                if attempt == STORE_ATTEMPTS - 1:
+                    logger.exception("Could not store the response for Idempotency-Key %s; leaving it pending", record_id)
+                    return
+                await asyncio.sleep(POLL_INTERVAL * 2 ** attempt)
+
+    async def _wait_for(self, record_id: str):
+        """The record once it is no longer pending (or the wait ran out); None if it was released."""
+        future = self._in_flight.get(record_id)
+        if future is not None:
+            self.waited += 1
+            try:
+                await asyncio.wait_for(asyncio.shield(future), timeout=self.wait)
+            except asyncio.TimeoutError:
+                pass
+            return await self.collection.find_one({"_id": record_id})
+
+        deadline = asyncio.get_running_loop().time() + self.wait
+        record = await self.collection.find_one({"_id": record_id})
+        if record is not None and record["status"] == "pending":
+            self.waited += 1
+        while record is not None and record["status"] == "pending" and asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(POLL_INTERVAL)
+            record = await self.collection.find_one({"_id": record_id})
+        return record
+
+    def _replay(self, response: dict):
+        return BSONResponse(response["body"], status_code=response["status_code"], headers={"Idempotent-Replayed": "true"})
+
+    def stats(self) -> dict:
+        return {
+            "executed": self.executed,
+            "replayed": self.replayed,
+            "waited": self.waited,
+            "conflicts": self.conflicts,
+            "in_flight": len(self._in_flight),
+        }
+
+
+idempotency_store = IdempotencyStore(idempotency_keys)
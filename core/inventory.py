@@ -0,0 +1,220 @@
+"""
+📦 Sharded stock counters for hot products.
+
+A product flagged with `stock_shards: N` keeps its stock in N documents of
+the `stock_shards` collection, {"_id": "<product_id>:<n>", "product_id",
+"count"}, instead of its own `in_stock` field. Checkouts decrement a
+randomly chosen shard with a guard (`count >= qty`), so concurrent buyers of
+the same SKU mostly write to different documents. The product's `in_stock`
+becomes a read-only total that `ShardedStock` re-aggregates every
+`interval` seconds, so listings and `in_stock` filters never touch the
+shards.
+
+Enable sharding before a sale (POST /products/{name}/stock-shards, or
+`python -m core.inventory --enable <id> 16`) and disable it afterwards;
+both fold stock between the two layouts while checkouts keep running. The
+flag flip and the read or reset of `in_stock` are one atomic update, and
+checkout's plain decrements only match unsharded products, so a checkout
+that loaded the product before the flip misses instead of writing to the
+wrong layout. Disabling deletes each counter and adds its count to
+`in_stock` in turn, so a shard take either lands before the fold (and is
+counted) or finds no counter. With transactions available the whole switch
+also runs in one.
+"""
+import asyncio
+import logging
+import random
+import sys
+from pymongo import UpdateOne
+from .config import STOCK_AGGREGATE_INTERVAL
+from . import database
+from .catalog_cache import catalog_cache
+from .database import products, stock_shards
+
+logger = logging.getLogger(__name__)
+
+
+def _shard_id(product_id, shard: int) -> str:
+    return f"{product_id}:{shard}"
+
+def _split(total: int, shards: int) -> list:
+    """Spread `total` units as evenly as possible over `shards` counters."""
+    base, extra = divmod(max(total, 0), shards)
+    return [base + (1 if i < extra else 0) for i in range(shards)]
+
+
+class ShardedStock:
+    def __init__(self, products, shards, interval=STOCK_AGGREGATE_INTERVAL, rng=None):
+        self.products = products
+        self.shards = shards
+        self.interval = interval
+        self.rng = rng or random.Random()
+        self._task = None
+        self.takes = 0
+        self.shard_misses = 0
+        self.split_takes = 0
+
+    # ---------------------- CHECKOUT ----------------------
+    async def take(self, product_id, shard_count: int, qty: int, session=None) -> list:
+        """
+        Guarded decrement of `qty` units. Tries shards in random order; if no
+        single shard holds `qty`, drains several. Returns [(product_id,
+        shard_id, units)] for `release`, or None (nothing taken) when total
+        stock is short.
+        """
+        self.takes += 1
+        order = self.rng.sample(range(shard_count), shard_count)
+        for shard in order:
+            result = await self.shards.update_one(
+                {"_id": _shard_id(product_id, shard), "count": {"$gte": qty}},
+                {"$inc": {"count": -qty}},
+                session=session,
+            )
+            if result.modified_count:
+                return [(product_id, _shard_id(product_id, shard), qty)]
+            self.shard_misses += 1
+
+        # Stock is fragmented across shards (or short): take what each one has left
+        self.split_takes += 1
+        taken, remaining = [], qty
+        docs = await self.shards.find({"product_id": product_id, "count": {"$gt": 0}}, session=session).to_list(length=None)
+        for doc in docs:
+            units = min(doc["count"], remaining)
+            result = await self.shards.update_one(
+                {"_id": doc["_id"], "count": {"$gte": units}}, {"$inc": {"count": -units}}, session=session
+            )
+            if result.modified_count:
+                taken.append((product_id, doc["_id"], units))
+                remaining -= units
+                if not remaining:
+                    return taken
+        await self.release(taken, session=session)
+        return None
+
+    async def release(self, taken: list, session=None):
+        """Give back units from `take` (failed checkout or rollback)."""
+        for product_id, shard_id, units in taken:
+            result = await self.shards.update_one({"_id": shard_id}, {"$inc": {"count": units}}, session=session)
+            if not result.matched_count:
+                # Sharding was disabled meanwhile and this counter already folded into in_stock
+                await self.products.update_one({"_id": product_id}, {"$inc": {"in_stock": units}}, session=session)
+
+    # ---------------------- AGGREGATION ----------------------
+    async def aggregate(self) -> int:
+        """Write each sharded product's current total to its `in_stock`. Returns the number of products changed."""
+        ops = [
+            UpdateOne(
+                {"_id": row["_id"], "stock_shards": {"$exists": True}, "in_stock": {"$ne": row["total"]}},
+                {"$set": {"in_stock": row["total"]}},
+            )
+            async for row in self.shards.aggregate([{"$group": {"_id": "$product_id", "total": {"$sum": "$count"}}}])
+        ]
+        if not ops:
+            return 0
+        result = await self.products.bulk_write(ops, ordered=False)
+        if result.modified_count:
+            catalog_cache.invalidate()
+        return result.modified_count
+
+    async def start(self):
+        self._task = asyncio.create_task(self._aggregate_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _aggregate_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.aggregate()
+            except Exception:
+                # Totals stay slightly stale; the next tick retries
+                logger.exception("Stock aggregation failed")
+
+    # ---------------------- ADMIN ----------------------
+    async def _atomically(self, operation):
+        """Run `operation(session)` in a transaction when the deployment has them, else with session=None."""
+        if not database.supports_transactions:
+            return await operation(None)
+        async with await database.current_db().client.start_session() as session:
+            return await session.with_transaction(operation)
+
+    async def enable(self, product_id, shard_count: int) -> bool:
+        """
+        Move a product's `in_stock` into `shard_count` counters. False if
+        missing, already sharded, or a compensating checkout still holds
+        stock on it (its rollback would restore units to `in_stock`).
+        """
+        async def split(session):
+            # Flag and stock read in one step: plain decrements stop matching from here on
+            product = await self.products.find_one_and_update(
+                {"_id": product_id, "stock_shards": {"$exists": False}, "stock_holds.0": {"$exists": False}},
+                {"$set": {"stock_shards": shard_count}},
+                session=session,
+            )
+            if not product:
+                return False
+            await self.reset(product_id, shard_count, product.get("in_stock", 0), session=session)
+            return True
+        return await self._atomically(split)
+
+    async def reset(self, product_id, shard_count: int, total: int, session=None):
+        """Replace the shard counters with `total` units (restock)."""
+        await self.shards.bulk_write([
+            UpdateOne({"_id": _shard_id(product_id, shard)}, {"$set": {"product_id": product_id, "count": units}}, upsert=True)
+            for shard, units in enumerate(_split(total, shard_count))
+        ], ordered=False, session=session)
+        await self.products.update_one({"_id": product_id}, {"$set": {"in_stock": total}}, session=session)
+
+    async def disable(self, product_id) -> bool:
+        """Fold the shards back into `in_stock` and drop them. False if the product was not sharded."""
+        async def fold(session):
+            # in_stock only held the aggregated total; it counts up from zero as each counter folds in
+            product = await self.products.find_one_and_update(
+                {"_id": product_id, "stock_shards": {"$exists": True}},
+                {"$unset": {"stock_shards": ""}, "$set": {"in_stock": 0}},
+                session=session,
+            )
+            if not product:
+                return False
+            shard_ids = [doc["_id"] async for doc in self.shards.find({"product_id": product_id}, {"_id": 1}, session=session)]
+            for shard_id in shard_ids:
+                doc = await self.shards.find_one_and_delete({"_id": shard_id}, session=session)
+                if doc and doc["count"]:
+                    await self.products.update_one({"_id": product_id}, {"$inc": {"in_stock": doc["count"]}}, session=session)
+            return True
+        return await self._atomically(fold)
+
+    async def discard(self, product_id):
+        """Drop the counters of a deleted product."""
+        await self.shards.delete_many({"product_id": product_id})
+
+    def stats(self) -> dict:
+        return {"takes": self.takes, "shard_misses": self.shard_misses, "split_takes": self.split_takes}
+
+
+sharded_stock = ShardedStock(products, stock_shards)
+
+
+async def _main(argv):
+    from bson import ObjectId
+    from . import database
+    await database.connect()
+    try:
+        if argv[:1] == ["--enable"] and len(argv) == 3:
+            print(await sharded_stock.enable(ObjectId(argv[1]), int(argv[2])))
+        elif argv[:1] == ["--disable"] and len(argv) == 2:
+            print(await sharded_stock.disable(ObjectId(argv[1])))
+        else:
+            print("usage: python -m core.inventory --enable <product_id> <shards> | --disable <product_id>")
+            return 2
+        return 0
+    finally:
+        database.close()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
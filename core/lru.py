@@ -0,0 +1,73 @@
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    🗃️ Size-bounded LRU map with optional per-entry expiry.
+
+    The shared core of the in-process caches (catalog, prices, JWT payloads,
+    MX verdicts, revocation verdicts, throttle buckets). A read refreshes an
+    entry's recency; an expired entry is dropped when it is read; once more
+    than `max_entries` are held the least recently used ones are evicted.
+
+    Entries expire `ttl` seconds after `put` (None: never), unless `put` is
+    given its own `ttl` or an absolute `expires_at` on the `clock`. Pass a
+    sentinel as `default` to `get` when None is a value worth caching.
+    """
+
+    def __init__(self, max_entries, ttl=None, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (value, expires_at or None)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= self.clock():
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, value, ttl=None, expires_at=None):
+        if expires_at is None:
+            ttl = self.ttl if ttl is None else ttl
+            expires_at = None if ttl is None else self.clock() + ttl
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key, default=None):
+        entry = self._entries.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def retain(self, keep):
+        """Drop every entry whose value fails `keep(value)`."""
+        for key in [key for key, (value, _) in self._entries.items() if not keep(value)]:
+            del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "evictions": self.evictions,
+        }
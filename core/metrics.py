@@ -0,0 +1,319 @@
+"""
+📊 In-process metrics, rendered in the Prometheus text format.
+
+- `MetricsMiddleware` times every request per (method, route template,
+  status class) and logs slow requests with their Mongo breakdown
+- `CommandListener` (registered on the Motor client) times every Mongo
+  command per (collection, command) and attributes it to the request that
+  issued it through a context variable
+- `metrics.timed(name)` / `metrics.add_time()` accumulate time spent in
+  bcrypt, JWT decoding and SMTP
+- `PoolListener` tracks connection pool utilization for the health endpoint
+
+Recording is a bisect and a few dict updates, so it stays on in production.
+Quantiles are estimated from the histogram buckets the same way Prometheus'
+histogram_quantile() does.
+"""
+import logging
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pymongo import monitoring
+from .config import SLOW_REQUEST_MS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Per-request {(collection, command): [count, seconds]}, set by MetricsMiddleware
+_request_commands = ContextVar("request_commands", default=None)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield bound, total
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        lower, seen = 0.0, 0
+        for bound, total in self.cumulative():
+            if total >= rank:
+                if bound == float("inf"):
+                    return lower
+                in_bucket = total - seen
+                return lower + (bound - lower) * ((rank - seen) / in_bucket if in_bucket else 0)
+            lower, seen = bound, total
+        return lower
+
+
+class Metrics:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.requests = {}        # (method, route, status) -> Histogram
+        self.request_mongo = {}   # (method, route) -> [commands, seconds]
+        self.mongo = {}           # (collection, command) -> Histogram
+        self.mongo_failures = {}  # (collection, command) -> count
+        self.timers = {}          # name -> [count, seconds]
+
+    def _histogram(self, table, key):
+        histogram = table.get(key)
+        if histogram is None:
+            histogram = table[key] = Histogram(self.buckets)
+        return histogram
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, commands: dict):
+        self._histogram(self.requests, (method, route, f"{status // 100}xx")).observe(seconds)
+        totals = self.request_mongo.setdefault((method, route), [0, 0.0])
+        for count, spent in commands.values():
+            totals[0] += count
+            totals[1] += spent
+
+    def observe_command(self, collection: str, command: str, seconds: float, failed=False):
+        key = (collection, command)
+        self._histogram(self.mongo, key).observe(seconds)
+        if failed:
+            self.mongo_failures[key] = self.mongo_failures.get(key, 0) + 1
+        per_request = _request_commands.get()
+        if per_request is not None:
+            entry = per_request.setdefault(key, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def add_time(self, name: str, seconds: float, count: int = 1):
+        entry = self.timers.setdefault(name, [0, 0.0])
+        entry[0] += count
+        entry[1] += seconds
+
+    @contextmanager
+    def timed(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    # ---------------------- PROMETHEUS TEXT FORMAT ----------------------
+    def render(self, gauges=None) -> str:
+        """`gauges`: optional {metric_name: {labels_tuple: value}} appended as gauges."""
+        out = []
+        self._render_histograms(out, "http_request_duration_seconds", ("method", "route", "status"), self.requests)
+        self._render_quantiles(out, "http_request_duration_quantile_seconds", ("method", "route", "status"), self.requests)
+
+        out.append("# TYPE http_request_mongo_commands_total counter")
+        for labels, (count, _) in sorted(self.request_mongo.items()):
+            out.append(f"http_request_mongo_commands_total{_labels(('method', 'route'), labels)} {count}")
+        out.append("# TYPE http_request_mongo_seconds_total counter")
+        for labels, (_, seconds) in sorted(self.request_mongo.items()):
+            out.append(f"http_request_mongo_seconds_total{_labels(('method', 'route'), labels)} {seconds:.6f}")
+
+        self._render_histograms(out, "mongo_command_duration_seconds", ("collection", "command"), self.mongo)
+        self._render_quantiles(out, "mongo_command_duration_quantile_seconds", ("collection", "command"), self.mongo)
+        out.append("# TYPE mongo_command_failures_total counter")
+        for labels, count in sorted(self.mongo_failures.items()):
+            out.append(f"mongo_command_failures_total{_labels(('collection', 'command'), labels)} {count}")
+
+        out.append("# TYPE app_operation_total counter")
+        for name, (count, _) in sorted(self.timers.items()):
+            out.append(f"app_operation_total{_labels(('operation',), (name,))} {count}")
+        out.append("# TYPE app_operation_seconds_total counter")
+        for name, (_, seconds) in sorted(self.timers.items()):
+            out.append(f"app_operation_seconds_total{_labels(('operation',), (name,))} {seconds:.6f}")
+
+        for metric, series in (gauges or {}).items():
+            out.append(f"# TYPE {metric} gauge")
+            for labels, value in sorted(series.items()):
+                names = tuple(name for name, _ in labels)
+                out.append(f"{metric}{_labels(names, tuple(v for _, v in labels))} {value}")
+        return "\n".join(out) + "\n"
+
+    def _render_histograms(self, out, metric, names, table):
+        out.append(f"# TYPE {metric} histogram")
+        for labels, histogram in sorted(table.items()):
+            for bound, total in histogram.cumulative():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                out.append(f"{metric}_bucket{_labels(names + ('le',), labels + (le,))} {total}")
+            out.append(f"{metric}_sum{_labels(names, labels)} {histogram.sum:.6f}")
+            out.append(f"{metric}_count{_labels(names, labels)} {histogram.count}")
+
+    def _render_quantiles(self, out, metric, names, table):
+        out.append(f"# TYPE {metric} gauge")
+        for labels, histogram in sorted(table.items()):
+            for q in QUANTILES:
+                out.append(f"{metric}{_labels(names + ('quantile',), labels + (str(q),))} {histogram.quantile(q):.6f}")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names, values) -> str:
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+metrics = Metrics()
+
+
+# ---------------------- MONGO COMMAND LISTENER ----------------------
+class CommandListener(monitoring.CommandListener):
+    """Times every command the driver sends; pass to the client as an event listener."""
+
+    def __init__(self, metrics=metrics):
+        self.metrics = metrics
+        self._collections = {}  # request_id -> collection name
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            target = event.command.get("collection")
+        self._collections[event.request_id] = target if isinstance(target, str) else ""
+
+    def succeeded(self, event):
+        collection = self._collections.pop(event.request_id, "")
+        self.metrics.observe_command(collection, event.command_name, event.duration_micros / 1e6)
+
+    def failed(self, event):
+        collection = self._collections.pop(event.request_id, "")
+        self.metrics.observe_command(collection, event.command_name, event.duration_micros / 1e6, failed=True)
+
+
+command_listener = CommandListener()
+
+
+# ---------------------- CONNECTION POOL LISTENER ----------------------
+class PoolListener(monitoring.ConnectionPoolListener):
+    """Tracks open, checked-out and waiting connections per server from the driver's pool events."""
+
+    def __init__(self):
+        self.servers = {}  # "host:port" -> counters
+
+    def _server(self, event):
+        address = "%s:%s" % event.address
+        server = self.servers.get(address)
+        if server is None:
+            server = self.servers[address] = {
+                "open": 0, "in_use": 0, "waiting": 0, "checkouts": 0, "checkout_failures": 0, "cleared": 0
+            }
+        return server
+
+    def pool_created(self, event):
+        self._server(event)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._server(event)["cleared"] += 1
+
+    def pool_closed(self, event):
+        self.servers.pop("%s:%s" % event.address, None)
+
+    def connection_created(self, event):
+        self._server(event)["open"] += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._server(event)["open"] -= 1
+
+    def connection_check_out_started(self, event):
+        self._server(event)["waiting"] += 1
+
+    def connection_check_out_failed(self, event):
+        server = self._server(event)
+        server["waiting"] -= 1
+        server["checkout_failures"] += 1
+
+    def connection_checked_out(self, event):
+        server = self._server(event)
+        server["waiting"] -= 1
+        server["in_use"] += 1
+        server["checkouts"] += 1
+
+    def connection_checked_in(self, event):
+        self._server(event)["in_use"] -= 1
+
+    def stats(self) -> dict:
+        return {address: dict(counters) for address, counters in self.servers.items()}
+
+
+pool_listener = PoolListener()
+
+
+# ---------------------- REQUEST TIMING MIDDLEWARE ----------------------
+def route_template(scope) -> str:
+    """
+    The matched route's path template, e.g. /orders/{order_id}. Route
+    templates rather than raw paths keep label cardinality bounded. Routes
+    from a router included with a prefix may report only their own path,
+    so the static prefix is recovered from the raw request path.
+    """
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return "<unmatched>"
+    regex = getattr(route, "path_regex", None)
+    path = scope["path"]
+    if regex is None or regex.match(path):
+        return template
+    for i in range(1, len(path)):
+        if path[i] == "/" and regex.match(path[i:]):
+            return path[:i] + template
+    return template
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware (no BaseHTTPMiddleware buffering), so streaming responses pass straight through."""
+
+    def __init__(self, app, metrics=metrics, slow_ms=SLOW_REQUEST_MS):
+        self.app = app
+        self.metrics = metrics
+        self.slow_ms = slow_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        commands = {}
+        token = _request_commands.set(commands)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_commands.reset(token)
+            self.metrics.observe_request(scope["method"], route_template(scope), status, elapsed, commands)
+            if elapsed * 1000 >= self.slow_ms:
+                breakdown = ", ".join(
+                    f"{collection}.{command} x{count} {spent * 1000:.1f}ms"
+                    for (collection, command), (count, spent) in sorted(commands.items(), key=lambda kv: -kv[1][1])
+                )
+                logger.warning("Slow request %s %s -> %s in %.1fms; mongo: %s",
+                               scope["method"], scope["path"], status, elapsed * 1000, breakdown or "none")
@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import smtplib
+import time
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from .config import SMTP_BACKEND, OUTBOX_WORKERS, OUTBOX_BATCH_SIZE, OUTBOX_MAX_ATTEMPTS, OUTBOX_CLAIM_LEASE
+from .database import email_outbox
+from .email_utils import build_message, SMTPTransport, LocalMailbox
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class _PooledConnection:
+    """
+    One authenticated SMTP session owned by a worker and reused across
+    batches. Reconnects once if the server dropped the idle connection.
+    """
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.smtp = None
+
+    def send(self, msg):
+        if self.smtp is None:
+            self.smtp = self.transport.connect()
+        try:
+            self.smtp.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            self.smtp = self.transport.connect()
+            self.smtp.send_message(msg)
+
+    def send_batch(self, messages):
+        errors = []
+        for msg in messages:
+            try:
+                self.send(msg)
+                errors.append(None)
+            except Exception as e:
+                errors.append(str(e))
+                self.close()
+        return errors
+
+    def close(self):
+        if self.smtp is not None:
+            try:
+                self.smtp.quit()
+            except Exception:
+                pass
+        self.smtp = None
+
+
+class EmailOutbox:
+    """
+    📬 Persistent email outbox.
+
+    Request handlers `enqueue()` a message (one insert, returns immediately);
+    a pool of background workers claims batches, sends them over reused SMTP
+    connections and retries failures with exponential backoff.
+
+    A claimed message records `claimed_at`; only claims older than
+    `claim_lease` seconds are put back in the queue, so a process starting
+    next to live ones (more workers, rolling restart) does not resend what
+    they are still sending.
+    """
+
+    def __init__(self, collection, transport, workers=OUTBOX_WORKERS, batch_size=OUTBOX_BATCH_SIZE,
+                 max_attempts=OUTBOX_MAX_ATTEMPTS, poll_interval=5.0, backoff_base=2.0, backoff_max=600.0,
+                 claim_lease=OUTBOX_CLAIM_LEASE):
+        self.collection = collection
+        self.transport = transport
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.claim_lease = claim_lease
+        self._tasks = []
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+
+    async def enqueue(self, recipient: str, subject: str, text_body: str, html_body: str):
+        now = datetime.utcnow()
+        await self.collection.insert_one({
+            "recipient": recipient,
+            "subject": subject,
+            "text_body": text_body,
+            "html_body": html_body,
+            "status": "pending",
+            "attempts": 0,
+            "created_at": now,
+            "next_attempt_at": now,
+        })
+        self._wakeup.set()
+
+    async def start(self):
+        self._stopping = False
+        # Claims from before leases existed get one full lease from now
+        await self.collection.update_many(
+            {"status": "sending", "claimed_at": {"$exists": False}}, {"$set": {"claimed_at": datetime.utcnow()}}
+        )
+        await self._requeue_stale()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        self._stopping = True
+        self._wakeup.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _requeue_stale(self):
+        """Messages claimed by a worker that died mid-send go back to the queue once the lease runs out."""
+        await self.collection.update_many(
+            {"status": "sending", "claimed_at": {"$lt": datetime.utcnow() - timedelta(seconds=self.claim_lease)}},
+            {"$set": {"status": "pending"}},
+        )
+
+    async def _claim_batch(self):
+        batch = []
+        while len(batch) < self.batch_size:
+            doc = await self.collection.find_one_and_update(
+                {"status": "pending", "next_attempt_at": {"$lte": datetime.utcnow()}},
+                {"$set": {"status": "sending", "claimed_at": datetime.utcnow()}},
+                sort=[("next_attempt_at", 1)],
+                return_document=ReturnDocument.AFTER,
+            )
+            if not doc:
+                break
+            batch.append(doc)
+        return batch
+
+    async def _worker(self):
+        conn = _PooledConnection(self.transport)
+        failures = 0
+        try:
+            while not self._stopping:
+                try:
+                    batch = await self._claim_batch()
+                    if batch:
+                        await self._deliver(conn, batch)
+                    else:
+                        await self._requeue_stale()
+                    failures = 0
+                except Exception:
+                    # A claimed batch goes back to the queue once its lease runs out
+                    failures += 1
+                    logger.exception("Outbox worker failed (%d in a row)", failures)
+                    await self._idle(min(self.poll_interval * self.backoff_base ** failures, self.backoff_max))
+                    continue
+                if not batch:
+                    await self._idle(self.poll_interval)
+        finally:
+            await asyncio.to_thread(conn.close)
+
+    async def _idle(self, seconds: float):
+        """Sleep until `seconds` pass or a new message (or stop) wakes the worker."""
+        self._wakeup.clear()
+        if self._stopping:
+            return
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _deliver(self, conn, batch):
+        built, results = [], []
+        for doc in batch:
+            try:
+                built.append((doc, build_message(doc["recipient"], doc["subject"], doc["text_body"], doc["html_body"])))
+            except Exception as e:
+                # A message that cannot be built fails on its own instead of stalling the batch
+                results.append((doc, f"Could not build message: {e}"))
+        if built:
+            start = time.perf_counter()
+            errors = await asyncio.to_thread(conn.send_batch, [msg for _, msg in built])
+            metrics.add_time("smtp", time.perf_counter() - start, count=len(built))
+            results += [(doc, error) for (doc, _), error in zip(built, errors)]
+
+        now = datetime.utcnow()
+        for doc, error in results:
+            if error is None:
+                await self.collection.update_one(
+                    {"_id": doc["_id"]},
+                    {"$set": {"status": "sent", "sent_at": now}, "$inc": {"attempts": 1}}
+                )
+                continue
+
+            attempts = doc["attempts"] + 1
+            if attempts >= self.max_attempts:
+                update = {"status": "failed", "last_error": error, "attempts": attempts}
+            else:
+                delay = min(self.backoff_base ** attempts, self.backoff_max)
+                update = {
+                    "status": "pending",
+                    "last_error": error,
+                    "attempts": attempts,
+                    "next_attempt_at": now + timedelta(seconds=delay),
+                }
+            await self.collection.update_one({"_id": doc["_id"]}, {"$set": update})
+
+
+transport = LocalMailbox() if SMTP_BACKEND == "local" else SMTPTransport()
+outbox = EmailOutbox(email_outbox, transport)
+
+
+async def enqueue_email(recipient: str, subject: str, text_body: str, html_body: str):
+    await outbox.enqueue(recipient, subject, text_body, html_body)
@@ -0,0 +1,105 @@
+import base64
+import json
+import time
+from datetime import datetime
+from bson import ObjectId
+from fastapi import HTTPException
+
+
+# ---------------------- CONTINUATION TOKENS ----------------------
+# Type a cursor value must decode to for each sort field; other fields take any scalar
+CURSOR_TYPES = {"_id": ObjectId, "created_at": datetime}
+_SCALARS = (str, int, float, ObjectId, datetime)
+
+def _encode_value(value):
+    if isinstance(value, ObjectId):
+        return {"$oid": str(value)}
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    return value
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if "$oid" in value:
+            return ObjectId(value["$oid"])
+        if "$date" in value:
+            return datetime.fromisoformat(value["$date"])
+    return value
+
+def encode_values(values: list) -> str:
+    raw = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_values(token: str, length: int) -> list:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = [_decode_value(v) for v in json.loads(base64.urlsafe_b64decode(padded))]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if len(values) != length:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+def encode_cursor(doc: dict, sort: list) -> str:
+    """Opaque token holding the sort-key values of the last document on a page."""
+    return encode_values([doc[field] for field, _ in sort])
+
+def decode_cursor(token: str, sort: list) -> list:
+    """
+    Decoded sort-key values, each checked against its field's type so a
+    forged token cannot put an operator document ({"$ne": null}) into the
+    seek filter.
+    """
+    values = decode_values(token, len(sort))
+    for value, (field, _) in zip(values, sort):
+        if isinstance(value, bool) or not isinstance(value, CURSOR_TYPES.get(field, _SCALARS)):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+# ---------------------- KEYSET QUERIES ----------------------
+def keyset_query(query: dict, sort: list, after: list) -> dict:
+    """
+    Extend `query` so it matches only documents strictly after `after` in
+    `sort` order, e.g. for [("created_at", -1), ("_id", -1)]:
+    created_at < c OR (created_at == c AND _id < id).
+    """
+    branches = []
+    for i, (field, direction) in enumerate(sort):
+        branch = {sort[j][0]: after[j] for j in range(i)}
+        branch[field] = {"$gt" if direction == 1 else "$lt": after[i]}
+        branches.append(branch)
+    seek = branches[0] if len(branches) == 1 else {"$or": branches}
+    return {"$and": [query, seek]} if query else seek
+
+async def fetch_page(collection, query: dict, sort: list, limit: int, cursor: str = None, skip: int = 0, projection=None):
+    """
+    Returns (docs, next_cursor). Seeks past `cursor` when given; `skip` only
+    serves legacy page-number requests. Fetches one extra document to know
+    whether a next page exists.
+    """
+    if cursor:
+        query = keyset_query(query, sort, decode_cursor(cursor, sort))
+    find = collection.find(query, projection).sort(sort)
+    if skip:
+        find = find.skip(skip)
+    docs = await find.limit(limit + 1).to_list(length=None)
+    next_cursor = encode_cursor(docs[limit - 1], sort) if len(docs) > limit else None
+    return docs[:limit], next_cursor
+
+
+class EstimatedCount:
+    """Caches `estimated_document_count()` (collection metadata, no scan) for `ttl` seconds."""
+
+    def __init__(self, collection, ttl=60.0, clock=time.monotonic):
+        self.collection = collection
+        self.ttl = ttl
+        self.clock = clock
+        self._value = None
+        self._expires_at = 0.0
+
+    async def get(self) -> int:
+        if self._value is None or self._expires_at <= self.clock():
+            self._value = await self.collection.estimated_document_count()
+            self._expires_at = self.clock() + self.ttl
+        return self._value
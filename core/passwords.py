@@ -0,0 +1,93 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from .config import BCRYPT_ROUNDS, PASSWORD_HASH_EXECUTOR, PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE
+from .metrics import metrics
+
+
+# ---------------------- WORKER FUNCTIONS (run inside the pool) ----------------------
+@lru_cache(maxsize=None)
+def _context(rounds: int) -> CryptContext:
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+
+def _hash_rounds(hashed: str):
+    # "$2b$12$<salt+digest>" -> 12
+    try:
+        return int(hashed.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+def _hash(password: str, rounds: int) -> str:
+    return _context(rounds).hash(password)
+
+def _verify(password: str, hashed: str, rounds: int):
+    """Returns (valid, new_hash); new_hash is set when the stored cost differs from `rounds`."""
+    if not _context(rounds).verify(password, hashed):
+        return False, None
+    if _hash_rounds(hashed) != rounds:
+        return True, _hash(password, rounds)
+    return True, None
+
+
+class PasswordHasher:
+    """
+    🔐 Shared bcrypt service.
+
+    Hashing and verification run in a sized process (or thread) pool instead of
+    on the event loop. At most `workers + max_pending` calls are admitted at
+    once; beyond that callers get an immediate 503 rather than queueing.
+    """
+
+    def __init__(self, rounds=BCRYPT_ROUNDS, workers=PASSWORD_HASH_WORKERS,
+                 max_pending=PASSWORD_HASH_QUEUE, executor=PASSWORD_HASH_EXECUTOR):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max_pending
+        self.executor_kind = executor
+        self._executor = None
+        self._in_flight = 0
+        self.rejected = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.executor_kind == "thread":
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+            else:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def _run(self, fn, *args):
+        if self._in_flight >= self.workers + self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Server busy, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            with metrics.timed("bcrypt"):
+                return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self._in_flight -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password, self.rounds)
+
+    async def verify(self, password: str, hashed: str):
+        """Returns (valid, new_hash). Persist `new_hash` when it is not None (cost changed)."""
+        return await self._run(_verify, password, hashed, self.rounds)
+
+    def stats(self) -> dict:
+        return {"in_flight": self._in_flight, "rejected": self.rejected, "workers": self.workers}
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,112 @@
+"""
+💲 Live cart repricing.
+
+Cart lines keep the price seen when the item was added. `reprice()` checks
+every line against current `products` with one `$in` lookup for whatever is
+not already in a short-TTL price cache, and works out line totals, the
+subtotal, stock shortfalls and price changes server-side.
+"""
+import time
+from bson import ObjectId
+from .config import PRICE_CACHE_SIZE, PRICE_CACHE_TTL
+from .database import products
+from .lru import LRUCache
+
+_FIELDS = {"name": 1, "price": 1, "in_stock": 1}
+_MISSING = object()
+
+
+class PriceCache:
+    """
+    Size-bounded LRU of product_id -> {"name", "price", "in_stock"} for `ttl`
+    seconds. Misses for a whole cart are fetched in one `$in` query; products
+    that no longer exist are cached as None so a deleted item does not cost a
+    round trip on every view. Admin writes call `clear()`, checkout calls
+    `discard()` for the products it touched.
+    """
+
+    def __init__(self, max_entries=10_000, ttl=5.0, clock=time.monotonic):
+        self._entries = LRUCache(max_entries, ttl=ttl, clock=clock)  # product_id -> product or None
+        self.queries = 0
+
+    async def lookup(self, product_ids) -> dict:
+        found, missing = {}, []
+        for pid in product_ids:
+            product = self._entries.get(pid, _MISSING)
+            if product is _MISSING:
+                missing.append(pid)
+            else:
+                found[pid] = product
+
+        if missing:
+            self.queries += 1
+            loaded = {
+                str(p.pop("_id")): p
+                for p in await products.find(
+                    {"_id": {"$in": [ObjectId(pid) for pid in missing]}}, dict(_FIELDS)
+                ).to_list(length=None)
+            }
+            for pid in missing:
+                found[pid] = loaded.get(pid)
+                self._entries.put(pid, found[pid])
+        return found
+
+    def discard(self, product_ids):
+        for pid in product_ids:
+            self._entries.pop(pid)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {**self._entries.stats(), "queries": self.queries}
+
+
+price_cache = PriceCache(max_entries=PRICE_CACHE_SIZE, ttl=PRICE_CACHE_TTL)
+
+
+async def reprice(items: list) -> dict:
+    """
+    Cart line items -> summary with current prices:
+      lines[]: unit_price (current), snapshot_price, line_total, available,
+               price_changed, out_of_stock, unavailable (product deleted)
+      subtotal, total_quantity, has_price_changes, has_stock_issues
+    Unavailable lines are listed but not counted in the subtotal.
+    """
+    current = await price_cache.lookup([item["product_id"] for item in items])
+    lines = []
+    subtotal = 0.0
+    total_quantity = 0
+    for item in items:
+        product = current.get(item["product_id"])
+        line = {
+            "product_id": item["product_id"],
+            "name": item.get("name"),
+            "quantity": item["quantity"],
+            "snapshot_price": item.get("price"),
+        }
+        if product is None:
+            line.update(unit_price=None, line_total=0.0, available=0,
+                        price_changed=False, out_of_stock=True, unavailable=True)
+        else:
+            line_total = round(product["price"] * item["quantity"], 2)
+            line.update(
+                name=product["name"],
+                unit_price=product["price"],
+                line_total=line_total,
+                available=product["in_stock"],
+                price_changed=product["price"] != item.get("price"),
+                out_of_stock=product["in_stock"] < item["quantity"],
+                unavailable=False,
+            )
+            subtotal += line_total
+            total_quantity += item["quantity"]
+        lines.append(line)
+
+    return {
+        "lines": lines,
+        "subtotal": round(subtotal, 2),
+        "total_quantity": total_quantity,
+        "has_price_changes": any(line["price_changed"] for line in lines),
+        "has_stock_issues": any(line["out_of_stock"] for line in lines),
+    }
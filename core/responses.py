@@ -0,0 +1,47 @@
+"""
+⚡ JSON responses that understand BSON types.
+
+`BSONResponse` serializes documents straight from the driver: ObjectId
+becomes its hex string, datetimes ISO 8601, Decimal128/Decimal a number.
+Routes that return large listings return a `BSONResponse` themselves, which
+skips both the per-document `_id` rewriting and FastAPI's generic
+`jsonable_encoder` pass. It is also the app-wide default response class.
+
+Uses orjson when it is installed and falls back to the standard library.
+"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from bson import Decimal128, ObjectId
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+def _number(value: Decimal):
+    return int(value) if value == value.to_integral_value() and value.as_tuple().exponent >= 0 else float(value)
+
+def _default(obj):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, Decimal128):
+        return _number(obj.to_decimal())
+    if isinstance(obj, Decimal):
+        return _number(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class BSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -0,0 +1,145 @@
+import asyncio
+import hashlib
+import math
+from datetime import datetime, timedelta
+from .database import token_blacklist
+from .lru import LRUCache
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings. No false negatives; false positives at roughly `error_rate`."""
+
+    def __init__(self, capacity=100_000, error_rate=0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class RevocationList:
+    """
+    🚫 Revoked-token check that usually avoids the database.
+
+    The blacklist stores `jti` + `exp` and a TTL index on `exp` drops entries
+    once the token would have expired anyway. In process we keep:
+      - an LRU of recently seen verdicts (revoked or not) for jtis we had to look up
+      - a Bloom filter of every live revoked jti, topped up every `refresh_interval`
+        seconds from entries revoked since the last refresh and rebuilt every
+        `rebuild_interval` seconds so expired jtis fall out
+
+    A jti the filter has never seen is not revoked, so the common case costs no
+    round trip. Revocations made by other workers become visible within one
+    refresh interval.
+
+    `revoked_at` is stamped by the server, and each refresh re-reads the last
+    `overlap` seconds before its watermark. An entry that commits after a
+    newer one (concurrent writes, equal timestamps) is therefore still
+    picked up; adding a jti twice is harmless.
+    """
+
+    def __init__(self, collection, capacity=100_000, error_rate=0.001, lru_size=10_000,
+                 refresh_interval=5.0, rebuild_interval=3600.0, overlap=30.0):
+        self.collection = collection
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self.overlap = overlap
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._recent = LRUCache(lru_size)  # jti -> revoked?
+        self._last_seen = None
+        self._task = None
+        self.bloom_negatives = 0
+        self.db_lookups = 0
+
+    async def start(self):
+        await self.rebuild()
+        self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def rebuild(self):
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        last_seen = self._last_seen
+        async for doc in self.collection.find({"jti": {"$exists": True}}, {"jti": 1, "revoked_at": 1}):
+            bloom.add(doc["jti"])
+            if last_seen is None or doc["revoked_at"] > last_seen:
+                last_seen = doc["revoked_at"]
+        self._bloom = bloom
+        self._last_seen = last_seen
+        # Drop cached "not revoked" verdicts so they are re-checked against the new filter
+        self._recent.retain(bool)
+
+    async def refresh(self):
+        query = {"jti": {"$exists": True}}
+        if self._last_seen is not None:
+            query["revoked_at"] = {"$gte": self._last_seen - timedelta(seconds=self.overlap)}
+        async for doc in self.collection.find(query, {"jti": 1, "revoked_at": 1}):
+            self._bloom.add(doc["jti"])
+            self._recent.put(doc["jti"], True)
+            if self._last_seen is None or doc["revoked_at"] > self._last_seen:
+                self._last_seen = doc["revoked_at"]
+
+    async def _refresh_loop(self):
+        since_rebuild = 0.0
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            since_rebuild += self.refresh_interval
+            try:
+                if since_rebuild >= self.rebuild_interval:
+                    since_rebuild = 0.0
+                    await self.rebuild()
+                else:
+                    await self.refresh()
+            except Exception:
+                # Keep serving from the current filter; the next tick retries
+                pass
+
+    async def revoke(self, jti: str, exp: datetime):
+        await self.collection.update_one(
+            {"jti": jti},
+            {"$setOnInsert": {"jti": jti, "exp": exp}, "$currentDate": {"revoked_at": True}},
+            upsert=True,
+        )
+        self._bloom.add(jti)
+        self._recent.put(jti, True)
+
+    async def is_revoked(self, jti: str) -> bool:
+        cached = self._recent.get(jti)
+        if cached is not None:
+            return cached
+        if jti not in self._bloom:
+            self.bloom_negatives += 1
+            return False
+
+        self.db_lookups += 1
+        revoked = await self.collection.find_one({"jti": jti}, {"_id": 1}) is not None
+        self._recent.put(jti, revoked)
+        return revoked
+
+    def stats(self) -> dict:
+        return {
+            "bloom_negatives": self.bloom_negatives,
+            "cache_hits": self._recent.hits,
+            "db_lookups": self.db_lookups,
+            "cached": len(self._recent),
+        }
+
+
+revocation_list = RevocationList(token_blacklist)
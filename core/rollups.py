@@ -0,0 +1,191 @@
+"""
+📈 Incrementally maintained sales rollups.
+
+Three small collections answer the admin analytics endpoints without
+touching `orders`:
+
+    sales_daily        {_id: "YYYY-MM-DD", orders, units, revenue}
+    sales_by_product   {_id: product_id, name, category, orders, units, revenue}
+    sales_by_category  {_id: category, orders, units, revenue}
+
+An order counts while it is not Canceled. `record()` adds an order's
+contribution when it is placed or un-canceled and subtracts it when it is
+canceled; each call is one bulk_write per rollup collection. Sales are
+bucketed under the category each order line captured at checkout, so
+re-categorising a product later does not move its past sales; lines from
+before categories were captured fall back to the product's current one. Rollups are
+updated after the order write commits, so a crash in between can leave
+them slightly off; `rebuild()` (python -m core.rollups --rebuild)
+recomputes everything from order history in streaming batches.
+"""
+import asyncio
+import logging
+import sys
+from collections import defaultdict
+from bson import ObjectId
+from pymongo import DESCENDING, IndexModel, UpdateOne
+from .database import products, sales_daily, sales_by_product, sales_by_category
+
+logger = logging.getLogger(__name__)
+
+UNCATEGORIZED = "Uncategorized"
+
+# Declared here so rebuild() can create them on the scratch collections; core.schema includes them
+ROLLUP_INDEXES = {
+    "sales_by_product": [
+        IndexModel([("revenue", DESCENDING)], name="revenue"),
+        IndexModel([("units", DESCENDING)], name="units"),
+    ],
+    "sales_by_category": [
+        IndexModel([("revenue", DESCENDING)], name="revenue"),
+    ],
+}
+
+
+def day_bucket(created_at) -> str:
+    return created_at.strftime("%Y-%m-%d")
+
+
+def _lines(order):
+    for item in order.get("items", []):
+        yield (item["product_id"], item.get("name"), item.get("category"),
+               item["quantity"], item["price"] * item["quantity"])
+
+
+async def _categories(product_ids, collection=None) -> dict:
+    """One $in lookup -> {product_id: category}; deleted products fall back to UNCATEGORIZED."""
+    ids = [ObjectId(pid) for pid in product_ids if ObjectId.is_valid(pid)]
+    if not ids:
+        return {}
+    found = (collection if collection is not None else products).find({"_id": {"$in": ids}}, {"category": 1})
+    return {str(p["_id"]): p.get("category") or UNCATEGORIZED async for p in found}
+
+
+async def record(order: dict, sign: int = 1, relabel: bool = False):
+    """
+    Add (sign=1) or remove (sign=-1) one order's contribution to every rollup.
+    `relabel` (a just-placed order) also refreshes the product's name and
+    category on its sales_by_product row; older orders only label new rows.
+    """
+    uncaptured = {pid for pid, _, category, *_ in _lines(order) if category is None}
+    categories = await _categories(uncaptured) if uncaptured else {}
+
+    day = {"orders": sign, "units": 0, "revenue": 0.0}
+    by_product = {}
+    by_category = defaultdict(lambda: {"orders": 0, "units": 0, "revenue": 0.0})
+    for pid, name, category, units, revenue in _lines(order):
+        category = category or categories.get(pid, UNCATEGORIZED)
+        day["units"] += sign * units
+        day["revenue"] += sign * revenue
+        line = by_product.setdefault(pid, {"name": name, "category": category, "orders": sign, "units": 0, "revenue": 0.0})
+        line["units"] += sign * units
+        line["revenue"] += sign * revenue
+        bucket = by_category[category]
+        bucket["units"] += sign * units
+        bucket["revenue"] += sign * revenue
+    for category in by_category:
+        by_category[category]["orders"] = sign
+
+    def inc(totals):
+        return {"$inc": {k: totals[k] for k in ("orders", "units", "revenue")}}
+
+    writes = [sales_daily.update_one({"_id": day_bucket(order["created_at"])}, inc(day), upsert=True)]
+    if by_product:
+        writes.append(sales_by_product.bulk_write([
+            UpdateOne(
+                {"_id": pid},
+                {**inc(t), "$set" if relabel else "$setOnInsert": {"name": t["name"], "category": t["category"]}},
+                upsert=True,
+            )
+            for pid, t in by_product.items()
+        ], ordered=False))
+        writes.append(sales_by_category.bulk_write([
+            UpdateOne({"_id": category}, inc(t), upsert=True) for category, t in by_category.items()
+        ], ordered=False))
+    await asyncio.gather(*writes)
+
+
+async def record_safely(order: dict, sign: int = 1, relabel: bool = False):
+    """record() for request paths: the order change already happened, so a rollup failure is logged, not raised."""
+    try:
+        await record(order, sign, relabel)
+    except Exception:
+        logger.exception("Sales rollup update failed for order %s; run `python -m core.rollups --rebuild`", order.get("_id"))
+
+
+# ---------------------- REBUILD ----------------------
+async def rebuild(db, batch_size=1000) -> dict:
+    """
+    Recompute every rollup from `orders`, streaming `batch_size` orders at a
+    time, into scratch collections that are then renamed over the live ones.
+    Increments made while a rebuild runs are lost, so run it when checkout
+    traffic is quiet.
+    """
+    daily = defaultdict(lambda: {"orders": 0, "units": 0, "revenue": 0.0})
+    by_product = {}
+    by_category = defaultdict(lambda: {"orders": 0, "units": 0, "revenue": 0.0})
+    categories = {}
+    scanned = 0
+
+    async def fold(batch):
+        unseen = {pid for order in batch for pid, *_ in _lines(order)} - set(categories)
+        categories.update({pid: UNCATEGORIZED for pid in unseen})
+        categories.update(await _categories(unseen, db["products"]))
+        for order in batch:
+            day = daily[day_bucket(order["created_at"])]
+            day["orders"] += 1
+            order_categories = set()
+            for pid, name, category, units, revenue in _lines(order):
+                # Products are labelled with their current category, sales bucketed by the order's
+                line = by_product.setdefault(pid, {"name": name, "category": categories[pid], "orders": 0, "units": 0, "revenue": 0.0})
+                category = category or categories[pid]
+                line["orders"] += 1
+                for totals in (day, line, by_category[category]):
+                    totals["units"] += units
+                    totals["revenue"] += revenue
+                order_categories.add(category)
+            for category in order_categories:
+                by_category[category]["orders"] += 1
+
+    batch = []
+    cursor = db["orders"].find({"status": {"$ne": "Canceled"}}, {"items": 1, "created_at": 1}).batch_size(batch_size)
+    async for order in cursor:
+        batch.append(order)
+        if len(batch) >= batch_size:
+            await fold(batch)
+            scanned += len(batch)
+            batch = []
+    if batch:
+        await fold(batch)
+        scanned += len(batch)
+
+    for name, totals in (("sales_daily", daily), ("sales_by_product", by_product), ("sales_by_category", by_category)):
+        scratch = db[f"{name}_rebuild"]
+        await scratch.drop()
+        docs = [{"_id": key, **value} for key, value in totals.items()]
+        for start in range(0, len(docs), batch_size):
+            await scratch.insert_many(docs[start:start + batch_size])
+        if docs:
+            if name in ROLLUP_INDEXES:
+                await scratch.create_indexes(ROLLUP_INDEXES[name])
+            await scratch.rename(name, dropTarget=True)
+        else:
+            await db[name].drop()
+    return {"orders": scanned, "days": len(daily), "products": len(by_product), "categories": len(by_category)}
+
+
+async def _main(argv):
+    from . import database
+    db = await database.connect()
+    try:
+        if "--rebuild" not in argv:
+            print("usage: python -m core.rollups --rebuild")
+            return 2
+        print(await rebuild(db))
+        return 0
+    finally:
+        database.close()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
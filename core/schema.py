@@ -0,0 +1,331 @@
+"""
+🗂️ Declarative indexes and startup migrations.
+
+`bootstrap()` runs pending migrations, then creates any declared index that
+is missing and reports drift against what the server actually has. It is
+idempotent and runs as a background task from the app lifespan hook.
+
+Run `python -m core.schema --explain` against a real server to check that
+every route query shape in ROUTE_QUERIES is answered from an index.
+"""
+import asyncio
+import logging
+import sys
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from .search import backfill_search_fields
+from .carts import migrate_cart_lines
+from .rollups import ROLLUP_INDEXES
+from .checkout import migrate_order_items
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------- DECLARED INDEXES ----------------------
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+    ],
+    "products": [
+        IndexModel([("name", ASCENDING)], name="name"),
+        IndexModel([("category_lc", ASCENDING)], name="category_lc"),
+        IndexModel([("search_terms", ASCENDING)], name="search_terms"),
+    ],
+    "stock_shards": [
+        IndexModel([("product_id", ASCENDING)], name="product_id"),
+    ],
+    "wishlist": [
+        IndexModel([("user_email", ASCENDING), ("product_id", ASCENDING)], unique=True, name="user_product_unique"),
+    ],
+    "orders": [
+        IndexModel([("user_email", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="user_created_id"),
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created_id"),
+    ],
+    **ROLLUP_INDEXES,
+    "token_blacklist": [
+        IndexModel([("exp", ASCENDING)], expireAfterSeconds=0, name="exp_ttl"),
+        IndexModel([("jti", ASCENDING)], unique=True, sparse=True, name="jti_unique"),
+        IndexModel([("revoked_at", ASCENDING)], sparse=True, name="revoked_at"),
+    ],
+    "email_outbox": [
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="status_next_attempt"),
+        IndexModel([("status", ASCENDING), ("claimed_at", ASCENDING)], name="status_claimed_at"),
+    ],
+    "rate_limits": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_ttl"),
+    ],
+    "idempotency_keys": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_ttl"),
+    ],
+}
+
+# Options that make two indexes on the same keys different
+_COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds")
+
+
+async def ensure_indexes(db) -> dict:
+    """
+    Create missing declared indexes and report drift per collection:
+      created    - declared indexes that were missing and are now built
+      mismatched - same keys as declared but different options (left alone)
+      undeclared - indexes on the server that are not declared (left alone)
+      failed     - declared indexes the server refused (e.g. duplicates under a unique key)
+    """
+    report = {}
+    for name, declared in INDEXES.items():
+        collection = db[name]
+        existing = await collection.index_information()
+        by_keys = {tuple(info["key"]): (index_name, info) for index_name, info in existing.items()}
+        entry = {"created": [], "mismatched": [], "undeclared": [], "failed": []}
+
+        declared_keys = set()
+        for model in declared:
+            doc = model.document
+            keys = tuple(doc["key"].items())
+            declared_keys.add(keys)
+            if keys in by_keys:
+                index_name, info = by_keys[keys]
+                if any(doc.get(opt) != info.get(opt) for opt in _COMPARED_OPTIONS):
+                    entry["mismatched"].append(index_name)
+                continue
+            try:
+                await collection.create_indexes([model])
+                entry["created"].append(doc["name"])
+            except OperationFailure as e:
+                entry["failed"].append(f"{doc['name']}: {e}")
+
+        entry["undeclared"] = [
+            index_name for keys, (index_name, _) in by_keys.items()
+            if keys not in declared_keys and index_name != "_id_"
+        ]
+        report[name] = entry
+    return report
+
+
+# ---------------------- MIGRATIONS ----------------------
+async def _dedupe_lines(collection, merge_quantity: bool) -> int:
+    """Collapse duplicate (user_email, product_id) rows so the unique index can be built."""
+    removed = 0
+    pipeline = [
+        {"$group": {
+            "_id": {"user_email": "$user_email", "product_id": "$product_id"},
+            "ids": {"$push": "$_id"},
+            "quantity": {"$sum": "$quantity"},
+            "count": {"$sum": 1},
+        }},
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+    async for group in collection.aggregate(pipeline):
+        keep, *drop = group["ids"]
+        if merge_quantity:
+            await collection.update_one({"_id": keep}, {"$set": {"quantity": group["quantity"]}})
+        result = await collection.delete_many({"_id": {"$in": drop}})
+        removed += result.deleted_count
+    return removed
+
+async def _dedupe_cart(db):
+    return await _dedupe_lines(db["cart"], merge_quantity=True)
+
+async def _dedupe_wishlist(db):
+    return await _dedupe_lines(db["wishlist"], merge_quantity=False)
+
+async def _cart_lines_to_documents(db):
+    return await migrate_cart_lines(db)
+
+async def _build_sales_rollups(db):
+    # A rebuild running alongside checkouts loses their increments, so backfilling
+    # existing orders is left to the operator instead of every deploy's startup
+    if await db["orders"].find_one({}, {"_id": 1}) is None:
+        return {"backfill": "not needed"}
+    logger.warning(
+        "Sales rollups do not include existing orders yet: run `python -m core.rollups --rebuild` "
+        "while checkout traffic is quiet"
+    )
+    return {"backfill": "pending"}
+
+async def _compact_order_items(db):
+    return await migrate_order_items(db)
+
+async def _backfill_product_search(db):
+    return await backfill_search_fields(db["products"])
+
+async def _backfill_name_prefixes(db):
+    return await backfill_search_fields(db["products"], missing="name_prefixes")
+
+
+# Applied in order, once each; names are recorded in `schema_migrations`
+MIGRATIONS = [
+    ("0001_product_search_fields", _backfill_product_search),
+    ("0002_dedupe_cart_lines", _dedupe_cart),
+    ("0003_dedupe_wishlist_lines", _dedupe_wishlist),
+    ("0004_cart_lines_to_documents", _cart_lines_to_documents),
+    ("0005_build_sales_rollups", _build_sales_rollups),
+    ("0006_compact_order_items", _compact_order_items),
+    ("0007_product_name_prefixes", _backfill_name_prefixes),
+]
+
+
+# A worker that claimed a migration and died is presumed gone after this long
+MIGRATION_LEASE = timedelta(hours=1)
+
+
+async def _claim(records, name: str) -> str:
+    """
+    Claim `name` for this worker: "claimed", "done" (already applied) or
+    "busy" (another worker is running it). A claim older than
+    MIGRATION_LEASE is taken over.
+    """
+    now = datetime.utcnow()
+    try:
+        await records.insert_one({"_id": name, "status": "running", "claimed_at": now})
+        return "claimed"
+    except DuplicateKeyError:
+        pass
+    taken = await records.find_one_and_update(
+        {"_id": name, "status": "running", "claimed_at": {"$lt": now - MIGRATION_LEASE}},
+        {"$set": {"claimed_at": now}},
+    )
+    if taken:
+        return "claimed"
+    record = await records.find_one({"_id": name}, {"status": 1})
+    # Records written before claims existed have no status and are applied
+    return "busy" if record and record.get("status") == "running" else "done"
+
+
+async def run_migrations(db) -> list:
+    """
+    Apply pending migrations in order. Every worker runs this at startup;
+    each migration is claimed in `schema_migrations` before it runs, so only
+    one worker applies it. A worker that finds a migration claimed by
+    another stops there and leaves the rest, in order, to that worker.
+    """
+    applied = []
+    records = db["schema_migrations"]
+    for name, migration in MIGRATIONS:
+        state = await _claim(records, name)
+        if state == "done":
+            continue
+        if state == "busy":
+            logger.info("Migration %s is running in another worker", name)
+            break
+        try:
+            result = await migration(db)
+        except BaseException:
+            await records.delete_one({"_id": name, "status": "running"})
+            raise
+        await records.update_one(
+            {"_id": name}, {"$set": {"status": "done", "applied_at": datetime.utcnow(), "result": result}}
+        )
+        applied.append(name)
+        logger.info("Applied migration %s (%s)", name, result)
+    return applied
+
+
+last_report = {}
+
+async def bootstrap(db) -> dict:
+    global last_report
+    try:
+        applied = await run_migrations(db)
+        indexes = await ensure_indexes(db)
+    except Exception:
+        logger.exception("Schema bootstrap failed")
+        raise
+    for collection, entry in indexes.items():
+        for kind in ("mismatched", "undeclared", "failed"):
+            if entry[kind]:
+                logger.warning("Index drift on %s (%s): %s", collection, kind, entry[kind])
+    last_report = {"migrations_applied": applied, "indexes": indexes}
+    return last_report
+
+
+# ---------------------- EXPLAIN CHECK ----------------------
+_SAMPLE_ID = ObjectId()
+
+# One entry per query shape the routes issue: (collection, filter, sort)
+ROUTE_QUERIES = [
+    ("users", {"email": "a@example.com"}, None),
+    ("products", {"_id": _SAMPLE_ID}, None),
+    ("products", {"name": "Phone"}, None),
+    ("products", {"category_lc": "books"}, [("_id", 1)]),
+    ("products", {"search_terms": {"$all": ["pho"]}}, None),
+    ("stock_shards", {"product_id": _SAMPLE_ID, "count": {"$gt": 0}}, None),
+    ("carts", {"_id": "a@example.com"}, None),
+    ("wishlist", {"user_email": "a@example.com"}, None),
+    ("wishlist", {"user_email": "a@example.com", "product_id": str(_SAMPLE_ID)}, None),
+    ("orders", {"user_email": "a@example.com"}, [("created_at", -1), ("_id", -1)]),
+    ("orders", {"_id": _SAMPLE_ID, "user_email": "a@example.com"}, None),
+    ("orders", {}, [("created_at", -1), ("_id", -1)]),
+    ("sales_daily", {"_id": {"$gte": "2024-01-01", "$lte": "2024-12-31"}}, [("_id", 1)]),
+    ("sales_by_product", {}, [("revenue", -1)]),
+    ("sales_by_product", {}, [("units", -1)]),
+    ("sales_by_category", {}, [("revenue", -1)]),
+    ("token_blacklist", {"jti": "abc"}, None),
+    ("token_blacklist", {"jti": {"$exists": True}, "revoked_at": {"$gte": datetime.utcnow()}}, None),
+    ("email_outbox", {"status": "pending", "next_attempt_at": {"$lte": datetime.utcnow()}}, [("next_attempt_at", 1)]),
+    ("email_outbox", {"status": "sending", "claimed_at": {"$lt": datetime.utcnow()}}, None),
+]
+
+
+def _stages(plan: dict):
+    yield plan.get("stage")
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _stages(child)
+
+
+def index_for(name: str, query: dict, sort=None):
+    """
+    Keys of the declared index (or _id) the planner can answer `query` and
+    `sort` from: one led by a filtered field, or for an unfiltered query one
+    whose keys start with the sort (in either direction). None means a
+    collection scan. An offline stand-in for `explain_route_queries`, which
+    needs a real server.
+    """
+    fields = [field for field in query if not field.startswith("$")]
+    sort = list(sort or [])
+    for keys in [[("_id", ASCENDING)]] + [list(model.document["key"].items()) for model in INDEXES.get(name, [])]:
+        if fields:
+            if keys[0][0] in fields:
+                return keys
+            continue
+        prefix = keys[:len(sort)]
+        if sort and (prefix == sort or prefix == [(field, -direction) for field, direction in sort]):
+            return keys
+    return None
+
+async def explain_route_queries(db) -> list:
+    """Returns [(collection, filter, sort)] for every route query whose winning plan is a COLLSCAN."""
+    scans = []
+    for name, query, sort in ROUTE_QUERIES:
+        cursor = db[name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = (await cursor.explain())["queryPlanner"]["winningPlan"]
+        if "COLLSCAN" in set(_stages(plan)):
+            scans.append((name, query, sort))
+    return scans
+
+
+async def _main(argv):
+    from . import database
+    db = await database.connect()
+    try:
+        report = await bootstrap(db)
+        print(report)
+        if "--explain" in argv:
+            scans = await explain_route_queries(db)
+            for name, query, sort in scans:
+                print(f"COLLSCAN: {name} {query} sort={sort}")
+            return 1 if scans else 0
+        return 0
+    finally:
+        database.close()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
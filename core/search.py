@@ -0,0 +1,124 @@
+import re
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import UpdateOne
+from .config import SEARCH_MAX_CANDIDATES
+
+MAX_PREFIX = 15
+
+# Derived fields stored on every product; hidden from API responses
+SEARCH_FIELDS = ("category_lc", "name_terms", "name_prefixes", "search_terms")
+HIDE_SEARCH_FIELDS = {field: 0 for field in SEARCH_FIELDS}
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text) -> list:
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+def normalize_category(category) -> str:
+    return category.strip().lower() if category else category
+
+def edge_ngrams(tokens) -> list:
+    grams = set()
+    for token in tokens:
+        for size in range(1, min(len(token), MAX_PREFIX) + 1):
+            grams.add(token[:size])
+    return sorted(grams)
+
+def search_fields(product: dict) -> dict:
+    """
+    Derived fields for indexed search:
+      - category_lc:  lower-cased category for equality matches
+      - name_terms:    name tokens, used for ranking
+      - name_prefixes: edge n-grams of the name tokens, used for ranking
+      - search_terms:  edge n-grams of name + description tokens (multikey index)
+    """
+    name_tokens = tokenize(product.get("name"))
+    return {
+        "category_lc": normalize_category(product.get("category")),
+        "name_terms": name_tokens,
+        "name_prefixes": edge_ngrams(name_tokens),
+        "search_terms": edge_ngrams(name_tokens + tokenize(product.get("description"))),
+    }
+
+def with_search_fields(product: dict) -> dict:
+    return {**product, **search_fields(product)}
+
+
+# ---------------------- QUERYING ----------------------
+def search_query(text: str) -> dict:
+    """Every query token must prefix-match a name/description token."""
+    tokens = [t[:MAX_PREFIX] for t in tokenize(text)]
+    return {"search_terms": {"$all": tokens}} if tokens else {}
+
+def score_expression(query_tokens: list) -> dict:
+    """
+    Aggregation expression for the relevance score: 3 per exact name-token
+    match, 2 per name-prefix match, 1 for a description-only match.
+    """
+    parts = [
+        {"$cond": [
+            {"$in": [q, {"$ifNull": ["$name_terms", []]}]}, 3,
+            {"$cond": [{"$in": [q[:MAX_PREFIX], {"$ifNull": ["$name_prefixes", []]}]}, 2, 1]},
+        ]}
+        for q in query_tokens
+    ]
+    # A bare 0 in $project would exclude the field instead of setting it
+    return {"$add": parts} if parts else {"$literal": 0}
+
+def check_search_key(after) -> tuple:
+    """A decoded search cursor must be [-score, 24-hex id]; anything else is a 400."""
+    neg_score, oid = after
+    if not isinstance(neg_score, int) or isinstance(neg_score, bool) or not isinstance(oid, str) \
+            or not ObjectId.is_valid(oid):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return neg_score, ObjectId(oid)
+
+async def ranked_search(collection, text: str, query: dict, limit: int, after=None, skip: int = 0,
+                        max_candidates=SEARCH_MAX_CANDIDATES):
+    """
+    Returns (ids, next_key) for one page ranked by relevance, ties broken by _id.
+    Matches come from the search_terms index and are scored and sorted on the
+    server. At most `max_candidates` of them are ranked, so a search costs the
+    same however large the catalog grows: a query specific enough to match
+    fewer is ranked and paged in full, a broader one ranks only the first
+    `max_candidates` index matches. `after` is the [-score, id] key of the
+    last document on the previous page; `skip` only serves legacy page-number
+    requests.
+    """
+    pipeline = [
+        {"$match": {**query, **search_query(text)}},
+        {"$limit": max_candidates},
+        {"$project": {"score": score_expression(tokenize(text))}},
+        {"$sort": {"score": -1, "_id": 1}},
+    ]
+    if after is not None:
+        neg_score, oid = check_search_key(after)
+        pipeline.append({"$match": {"$or": [{"score": {"$lt": -neg_score}}, {"score": -neg_score, "_id": {"$gt": oid}}]}})
+    elif skip:
+        pipeline.append({"$skip": skip})
+    pipeline.append({"$limit": limit + 1})
+
+    ranked = await collection.aggregate(pipeline).to_list(length=None)
+    page = ranked[:limit]
+    next_key = [-page[-1]["score"], str(page[-1]["_id"])] if len(ranked) > limit else None
+    return [doc["_id"] for doc in page], next_key
+
+
+# ---------------------- BACKFILL ----------------------
+async def backfill_search_fields(collection, batch_size=1000, missing="search_terms") -> int:
+    """Populate derived fields on products that lack the `missing` field. Returns the number updated."""
+    updated = 0
+    batch = []
+    cursor = collection.find({missing: {"$exists": False}}, {"name": 1, "description": 1, "category": 1})
+    async for doc in cursor:
+        batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": search_fields(doc)}))
+        if len(batch) >= batch_size:
+            await collection.bulk_write(batch, ordered=False)
+            updated += len(batch)
+            batch = []
+    if batch:
+        await collection.bulk_write(batch, ordered=False)
+        updated += len(batch)
+    return updated
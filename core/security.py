@@ -1,19 +1,27 @@
+import time
 from jose import jwt, JWTError, ExpiredSignatureError
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
+from uuid import uuid4
 from fastapi import HTTPException, Depends
 from fastapi.security import OAuth2PasswordBearer
-from .config import SECRET_KEY, ALGORITHM
-from .config import token_blacklist
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from .config import SECRET_KEY, ALGORITHM, JWT_CACHE_SIZE
+from .database import token_blacklist
+from .passwords import password_hasher
+from .revocation import revocation_list
+from .token_cache import TokenCache
+from .metrics import metrics
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
+token_cache = TokenCache(max_size=JWT_CACHE_SIZE)
 
-def hash_password(password: str):
-    return pwd_context.hash(password)
+async def hash_password(password: str):
+    return await password_hasher.hash(password)
+
+async def verify_password(password: str, hashed: str):
+    return await password_hasher.verify(password, hashed)
 
 def create_token(email: str, expire_hours: int, role="user", verified=False):
     expire = datetime.utcnow() + timedelta(hours=expire_hours)
-    payload = {"sub": email, "role": role, "verified": verified, "exp": expire}
+    payload = {"sub": email, "role": role, "verified": verified, "exp": expire, "jti": uuid4().hex}
     return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
 
 def verify_token(token: str):
@@ -25,9 +33,33 @@ def verify_token(token: str):
     except JWTError:
         raise HTTPException(status_code=400, detail="Invalid token")
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
+async def revoke_token(token: str):
+    token_cache.discard(token)
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    if "jti" in payload:
+        await revocation_list.revoke(payload["jti"], datetime.utcfromtimestamp(payload["exp"]))
+    else:
+        # Tokens issued before jti support
+        await token_blacklist.insert_one({"token": token})
+
+async def is_token_revoked(token: str, payload: dict) -> bool:
+    if "jti" in payload:
+        return await revocation_list.is_revoked(payload["jti"])
+    return await token_blacklist.find_one({"token": token}) is not None
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
     try:
-        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = token_cache.get(token)
+        if payload is None:
+            start = time.perf_counter()
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            elapsed = time.perf_counter() - start
+            token_cache.record_decode(elapsed)
+            metrics.add_time("jwt_decode", elapsed)
+            token_cache.put(token, payload)
+        if await is_token_revoked(token, payload):
+            raise HTTPException(status_code=401, detail="Token has been revoked. Please log in again.")
+        return dict(payload)
     except ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except JWTError:
@@ -37,23 +69,3 @@ def admin_required(current_user: dict = Depends(get_current_user)):
     if current_user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     return current_user
-
-
-
-
-def revoke_token(token: str):
-    token_blacklist.insert_one({"token": token})
-
-def is_token_revoked(token: str) -> bool:
-    return token_blacklist.find_one({"token": token}) is not None
-
-def get_current_user(token: str = Depends(oauth2_scheme)):
-    try:
-        if is_token_revoked(token):
-            raise HTTPException(status_code=401, detail="Token has been revoked. Please log in again.")
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token expired")
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
@@ -0,0 +1,138 @@
+"""
+🚦 Attempt throttling for the unauthenticated auth endpoints.
+
+`throttle.check(action, ip=..., account=...)` runs first thing in login,
+register and forgot-password, before any database lookup, bcrypt work or
+email, and raises 429 with Retry-After once a caller is over its limit.
+Each action has an optional limit per client IP and per account (email),
+configured as "<attempts>/<seconds>"; "0" or "" disables that limit.
+
+Backends (THROTTLE_BACKEND):
+  - memory: a token bucket per key in this process (default, single worker)
+  - mongo:  a sliding-window counter in the `rate_limits` collection, shared
+            by every worker; old windows are dropped by a TTL index
+"""
+import math
+import time
+from datetime import datetime
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+from .config import (
+    THROTTLE_BACKEND, THROTTLE_MAX_KEYS, THROTTLE_LOGIN_PER_IP, THROTTLE_LOGIN_PER_ACCOUNT,
+    THROTTLE_REGISTER_PER_IP, THROTTLE_REGISTER_PER_ACCOUNT, THROTTLE_FORGOT_PER_IP, THROTTLE_FORGOT_PER_ACCOUNT,
+)
+from .database import rate_limits
+from .lru import LRUCache
+
+
+def parse_rule(spec):
+    """Parse "5/60" (at most 5 attempts per 60 seconds) into (5, 60.0); None when disabled."""
+    if not spec or spec.strip() == "0":
+        return None
+    attempts, _, seconds = spec.partition("/")
+    return int(attempts), float(seconds or 60)
+
+
+class MemoryBackend:
+    """
+    Token bucket per key: `limit` tokens, refilled continuously at
+    limit/window per second. At most `max_keys` buckets are kept (least
+    recently used dropped first), so memory stays bounded under key spraying.
+    """
+
+    def __init__(self, max_keys=100_000, clock=time.monotonic):
+        self.clock = clock
+        self._buckets = LRUCache(max_keys)  # key -> (tokens, updated_at)
+
+    async def hit(self, key: str, limit: int, window: float) -> float:
+        """Take one token; returns 0 when allowed, otherwise seconds until the next token."""
+        now = self.clock()
+        rate = limit / window
+        tokens, updated_at = self._buckets.get(key, (limit, now))
+        tokens = min(limit, tokens + (now - updated_at) * rate)
+
+        if tokens >= 1:
+            tokens -= 1
+            wait = 0.0
+        else:
+            wait = (1 - tokens) / rate
+        self._buckets.put(key, (tokens, now))
+        return wait
+
+    def stats(self) -> dict:
+        return {"keys": len(self._buckets)}
+
+
+class MongoBackend:
+    """
+    Sliding-window counter shared across workers: one document per key and
+    fixed window, {"_id": "<key>:<window>:<n>", "count", "expires_at"}. The
+    estimate weights the previous window by how much of it still overlaps
+    the sliding window. Rejected attempts are counted too, so a caller that
+    keeps hammering stays blocked.
+    """
+
+    def __init__(self, collection, clock=time.time):
+        self.collection = collection
+        self.clock = clock
+
+    async def hit(self, key: str, limit: int, window: float) -> float:
+        now = self.clock()
+        current = int(now // window)
+        elapsed = now - current * window
+        doc = await self.collection.find_one_and_update(
+            {"_id": f"{key}:{window:g}:{current}"},
+            {"$inc": {"count": 1}, "$setOnInsert": {"expires_at": datetime.utcfromtimestamp((current + 2) * window)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        previous = await self.collection.find_one({"_id": f"{key}:{window:g}:{current - 1}"}, {"count": 1})
+        estimate = doc["count"] + (previous["count"] if previous else 0) * (1 - elapsed / window)
+        return 0.0 if estimate <= limit else window - elapsed
+
+    def stats(self) -> dict:
+        return {}
+
+
+class Throttle:
+    """Applies per-IP and per-account rules for each action and counts the verdicts."""
+
+    def __init__(self, backend, rules: dict):
+        self.backend = backend
+        self.rules = rules  # action -> {"ip": (limit, window) or None, "account": ...}
+        self.allowed = 0
+        self.rejected = {}  # "action_scope" -> count
+
+    async def check(self, action: str, ip: str = None, account: str = None):
+        rules = self.rules.get(action, {})
+        for scope, value in (("ip", ip), ("account", account.strip().lower() if account else None)):
+            rule = rules.get(scope)
+            if rule is None or not value:
+                continue
+            wait = await self.backend.hit(f"{action}:{scope}:{value}", *rule)
+            if wait > 0:
+                name = f"{action}_{scope}"
+                self.rejected[name] = self.rejected.get(name, 0) + 1
+                raise HTTPException(
+                    status_code=429,
+                    detail="Too many attempts, please retry later",
+                    headers={"Retry-After": str(max(1, math.ceil(wait)))},
+                )
+        self.allowed += 1
+
+    def stats(self) -> dict:
+        return {
+            "allowed": self.allowed,
+            **{f"rejected_{name}": count for name, count in self.rejected.items()},
+            **self.backend.stats(),
+        }
+
+
+RULES = {
+    "login": {"ip": parse_rule(THROTTLE_LOGIN_PER_IP), "account": parse_rule(THROTTLE_LOGIN_PER_ACCOUNT)},
+    "register": {"ip": parse_rule(THROTTLE_REGISTER_PER_IP), "account": parse_rule(THROTTLE_REGISTER_PER_ACCOUNT)},
+    "forgot_password": {"ip": parse_rule(THROTTLE_FORGOT_PER_IP), "account": parse_rule(THROTTLE_FORGOT_PER_ACCOUNT)},
+}
+
+backend = MongoBackend(rate_limits) if THROTTLE_BACKEND == "mongo" else MemoryBackend(THROTTLE_MAX_KEYS)
+throttle = Throttle(backend, RULES)
@@ -0,0 +1,45 @@
+import hashlib
+import time
+from .lru import LRUCache
+
+
+class TokenCache:
+    """
+    🎟️ Bounded cache of verified JWT payloads keyed by a SHA-256 digest of the
+    token. Entries expire at the token's own `exp` and are evicted LRU-first
+    when the cache is full.
+    """
+
+    def __init__(self, max_size=10_000, clock=time.time):
+        self._entries = LRUCache(max_size, clock=clock)  # digest -> payload
+        self.decodes = 0
+        self.decode_seconds = 0.0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str):
+        return self._entries.get(self._key(token))
+
+    def put(self, token: str, payload: dict):
+        self._entries.put(self._key(token), payload, expires_at=payload["exp"])
+
+    def discard(self, token: str):
+        self._entries.pop(self._key(token))
+
+    def record_decode(self, seconds: float):
+        self.decodes += 1
+        self.decode_seconds += seconds
+
+    def stats(self) -> dict:
+        avg_decode = self.decode_seconds / self.decodes if self.decodes else 0.0
+        entries = self._entries.stats()
+        return {
+            "hits": entries["hits"],
+            "misses": entries["misses"],
+            "hit_rate": entries["hit_rate"],
+            "size": entries["entries"],
+            "avg_decode_ms": avg_decode * 1000,
+            "estimated_saved_ms": self._entries.hits * avg_decode * 1000,
+        }
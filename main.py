@@ -1,11 +1,45 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI
+from core import database, schema
+from core.inventory import sharded_stock
+from core.outbox import outbox
+from core.passwords import password_hasher
+from core.metrics import MetricsMiddleware
+from core.responses import BSONResponse
+from core.revocation import revocation_list
 from routes import auth_routes, profile_routes, product_routes
-from routes import cart, wishlist, orders
+from routes import cart, wishlist, orders, analytics, metrics, health
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    db = await database.connect()
+    # Migrations + index build run in the background so startup is not blocked
+    bootstrap = asyncio.create_task(schema.bootstrap(db))
+    await outbox.start()
+    await revocation_list.start()
+    await sharded_stock.start()
+    yield
+    if not bootstrap.done():
+        bootstrap.cancel()
+    await asyncio.gather(bootstrap, return_exceptions=True)
+    await sharded_stock.stop()
+    await revocation_list.stop()
+    await outbox.stop()
+    password_hasher.shutdown()
+    database.close()
+
+
 app = FastAPI(
     title="E-Commerce API",
     description="Secure E-commerce API with authentication, user profiles, and product management.",
-    version="1.0"
+    version="1.0",
+    lifespan=lifespan,
+    default_response_class=BSONResponse,
+    dependencies=[Depends(database.bind_database)]
 )
+app.add_middleware(MetricsMiddleware)
 
 # Register routers
 app.include_router(auth_routes.router, prefix="/auth", tags=["Authentication"])
@@ -15,4 +49,7 @@ app.include_router(product_routes.router, prefix="/products", tags=["Products"])
 
 app.include_router(cart.router)
 app.include_router(wishlist.router)
-app.include_router(orders.router)
\ No newline at end of file
+app.include_router(orders.router)
+app.include_router(analytics.router)
+app.include_router(metrics.router)
+app.include_router(health.router)
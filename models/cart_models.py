@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+from typing import List
+
+class BulkItem(BaseModel):
+    product_id: str
+    quantity: int = 1
+
+class BulkItems(BaseModel):
+    items: List[BulkItem]
+
+class BulkProductIds(BaseModel):
+    product_ids: List[str]
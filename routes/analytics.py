@@ -0,0 +1,75 @@
+from datetime import date, datetime, timedelta, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query
+from core.security import admin_required
+from core.database import collection
+from typing import Optional, Literal
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"], dependencies=[Depends(admin_required)])
+
+
+def _bucket(doc: dict) -> dict:
+    doc["revenue"] = round(doc.get("revenue", 0.0), 2)
+    return doc
+
+
+# ---------------------- ADMIN: SALES PER DAY ----------------------
+@router.get("/daily")
+async def daily_sales(
+    start: Optional[date] = Query(None, description="First day (default: 30 days before `end`)"),
+    end: Optional[date] = Query(None, description="Last day, inclusive (default: today, UTC)"),
+    sales_daily=Depends(collection("sales_daily")),
+):
+    """
+    📅 Admin only — orders, units and revenue per day from the sales rollup.
+    """
+    end = end or datetime.now(timezone.utc).date()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if (end - start).days > 366:
+        raise HTTPException(status_code=400, detail="Date range is limited to one year")
+
+    days = await sales_daily.find(
+        {"_id": {"$gte": start.isoformat(), "$lte": end.isoformat()}}
+    ).sort("_id", 1).to_list(length=None)
+
+    totals = {"orders": 0, "units": 0, "revenue": 0.0}
+    for day in days:
+        for key in totals:
+            totals[key] += day.get(key, 0)
+        day["day"] = day.pop("_id")
+        _bucket(day)
+    return {"start": start, "end": end, "days": days, "totals": _bucket(totals)}
+
+
+# ---------------------- ADMIN: TOP PRODUCTS ----------------------
+@router.get("/products")
+async def top_products(
+    sort: Literal["revenue", "units"] = "revenue",
+    limit: int = Query(10, ge=1, le=100),
+    sales_by_product=Depends(collection("sales_by_product")),
+):
+    """
+    🏆 Admin only — best-selling products by revenue or units.
+    """
+    docs = await sales_by_product.find({}).sort(sort, -1).limit(limit).to_list(length=None)
+    for doc in docs:
+        doc["product_id"] = doc.pop("_id")
+        _bucket(doc)
+    return {"sort": sort, "products": docs}
+
+
+# ---------------------- ADMIN: SALES PER CATEGORY ----------------------
+@router.get("/categories")
+async def category_sales(
+    limit: int = Query(50, ge=1, le=500),
+    sales_by_category=Depends(collection("sales_by_category"))
+):
+    """
+    🗂️ Admin only — orders, units and revenue per product category.
+    """
+    docs = await sales_by_category.find({}).sort("revenue", -1).limit(limit).to_list(length=None)
+    for doc in docs:
+        doc["category"] = doc.pop("_id")
+        _bucket(doc)
+    return {"categories": docs}
@@ -1,35 +1,44 @@
 from fastapi import APIRouter, HTTPException, Request, Form, Depends, Query
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from datetime import datetime, timedelta
 from pydantic import EmailStr
-from core.security import hash_password, create_token, verify_token
-from core.config import users, TOKEN_EXPIRE_HOURS
-from core.email_utils import send_email, validate_email_exists
-from passlib.context import CryptContext
+from core.security import hash_password, verify_password, create_token, verify_token
+from core.config import TOKEN_EXPIRE_HOURS
+from core.database import LazyCollection, collection
+from core.email_utils import validate_email_exists
+from core.outbox import enqueue_email
+from core.throttle import throttle
+from bson import ObjectId
 from fastapi import APIRouter, Depends, status
 from fastapi.security import OAuth2PasswordBearer
 from core.security import get_current_user, revoke_token, admin_required
 from models.user_models import UserRegister
+from core.pagination import fetch_page, EstimatedCount
+from core.responses import BSONResponse, dumps
+from typing import Optional, Literal
+import csv
+import io
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 router = APIRouter()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+user_count_estimate = EstimatedCount(LazyCollection("users"))
 
 @router.post("/register")
-async def register_user(request_data: UserRegister, request: Request):
+async def register_user(request_data: UserRegister, request: Request, users=Depends(collection("users"))):
     email = request_data.email
-    
+    await throttle.check("register", ip=request.client.host, account=email)
+
     password = request_data.password
 
     # Check if user already exists
-    if users.find_one({"email": email}):
+    if await users.find_one({"email": email}):
         raise HTTPException(status_code=400, detail="User already registered")
 
     # Hash password
-    hashed_password = pwd_context.hash(password)
+    hashed_password = await hash_password(password)
 
     # Save user to database
-    users.insert_one({
+    await users.insert_one({
         
         "email": email,
         "password": hashed_password,
@@ -44,8 +53,8 @@ async def register_user(request_data: UserRegister, request: Request):
     expire_time = datetime.utcnow() + timedelta(hours=1)
     formatted_expire_time = expire_time.strftime("%Y-%m-%d %H:%M UTC")
 
-    # Send verification email
-    send_email(
+    # Queue verification email
+    await enqueue_email(
         email,
         "Verify Your Account",
         f"Click the link to verify your account: {verification_link}\nExpires at: {formatted_expire_time}",
@@ -61,29 +70,42 @@ async def register_user(request_data: UserRegister, request: Request):
     return {"message": "Registration successful! Please check your email for verification link."}
 
 @router.get("/verify/{token}")
-async def verify_email(token: str):
+async def verify_email(token: str, users=Depends(collection("users"))):
     email = verify_token(token)
-    user = users.find_one({"email": email})
+    user = await users.find_one({"email": email})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     if user["is_verified"]:
         return {"message": "Account already verified."}
 
-    users.update_one({"email": email}, {"$set": {"is_verified": True}})
+    await users.update_one({"email": email}, {"$set": {"is_verified": True}})
     return {"message": "Email verified successfully!"}
 
 @router.post("/login")
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), request: Request = None):
-    user = users.find_one({"email": form_data.username})
-    if not user or not pwd_context.verify(form_data.password, user["password"]):
+async def login(
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    request: Request = None,
+    users=Depends(collection("users"))
+):
+    # Over-limit attempts are turned away before the user lookup and bcrypt verify
+    await throttle.check("login", ip=request.client.host, account=form_data.username)
+    user = await users.find_one({"email": form_data.username})
+    if not user:
         raise HTTPException(status_code=400, detail="Invalid email or password")
 
+    valid, new_hash = await verify_password(form_data.password, user["password"])
+    if not valid:
+        raise HTTPException(status_code=400, detail="Invalid email or password")
+    if new_hash:
+        # bcrypt cost changed since this hash was stored
+        await users.update_one({"_id": user["_id"]}, {"$set": {"password": new_hash}})
+
     if not user.get("is_verified", False):
         token = create_token(user["email"], TOKEN_EXPIRE_HOURS)
         verify_link = f"{request.url.scheme}://{request.client.host}:8000/auth/verify/{token}"
         expire_time = datetime.utcnow() + timedelta(hours=TOKEN_EXPIRE_HOURS)
         formatted_expire_time = expire_time.strftime("%Y-%m-%d %H:%M UTC")
-        send_email(
+        await enqueue_email(
             user["email"],
             "Resend: Verify your account",
             f"Verify here: {verify_link}\nExpires: {formatted_expire_time}",
@@ -107,8 +129,9 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), request: Reque
     return {"access_token": access_token, "token_type": "bearer", "expires_in": "1 hour"}
 
 @router.post("/forgot-password")
-async def forgot_password(email: EmailStr, request: Request):
-    user = users.find_one({"email": email})
+async def forgot_password(email: EmailStr, request: Request, users=Depends(collection("users"))):
+    await throttle.check("forgot_password", ip=request.client.host, account=email)
+    user = await users.find_one({"email": email})
     if not user:
         raise HTTPException(status_code=404, detail="Email not found")
 
@@ -117,7 +140,7 @@ async def forgot_password(email: EmailStr, request: Request):
     expire_time = datetime.utcnow() + timedelta(hours=1)
     formatted_expire_time = expire_time.strftime("%Y-%m-%d %H:%M UTC")
 
-    send_email(
+    await enqueue_email(
         email,
         "Reset Your Password",
         f"Reset your password: {reset_link}\nExpires at: {formatted_expire_time}",
@@ -152,36 +175,87 @@ async def get_reset_form(token: str):
     """
 
 @router.post("/reset-password/{token}")
-async def reset_password(token: str, new_password: str = Form(...)):
+async def reset_password(token: str, new_password: str = Form(...), users=Depends(collection("users"))):
     email = verify_token(token)
-    user = users.find_one({"email": email})
+    user = await users.find_one({"email": email})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    hashed_pw = hash_password(new_password)
-    users.update_one({"email": email}, {"$set": {"password": hashed_pw}})
+    hashed_pw = await hash_password(new_password)
+    await users.update_one({"email": email}, {"$set": {"password": hashed_pw}})
     return {"message": "Password reset successful!"}
 
 
+# Fields returned by the admin listing and export; never the password hash
+USER_FIELDS = ("email", "role", "is_verified", "created_at", "name", "phone", "address")
+USER_PROJECTION = {field: 1 for field in USER_FIELDS}
+USER_SORT = [("_id", 1)]
+
+
 @router.get("/users")
-async def get_all_users(admin: dict = Depends(admin_required)):
+async def get_all_users(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="Continuation token from the previous page's next_cursor"),
+    include_total: bool = Query(False, description="Exact count instead of the cached estimate"),
+    admin: dict = Depends(admin_required),
+    users=Depends(collection("users"))
+):
     """
-    🧑‍💼 Admin-only endpoint: View all registered users
+    🧑‍💼 Admin-only endpoint: View registered users, one page at a time
     """
-    user_list = []
-    for user in users.find({}, {"password": 0}):  # exclude password for security
-        user["_id"] = str(user["_id"])
-        user_list.append(user)
+    docs, next_cursor = await fetch_page(users, {}, USER_SORT, limit, cursor=cursor, projection=dict(USER_PROJECTION))
+    return BSONResponse({
+        "total_users": await users.count_documents({}) if include_total else await user_count_estimate.get(),
+        "total_is_estimate": not include_total,
+        "users": docs,
+        "next_cursor": next_cursor
+    })
+
 
-    return {
-        "total_users": len(user_list),
-        "users": user_list
-    }
+async def _stream_users(users, batch_size: int, fmt: str):
+    """Yield every user as NDJSON or CSV, `batch_size` documents per chunk."""
+    cursor = users.find({}, dict(USER_PROJECTION)).sort(USER_SORT).batch_size(batch_size)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == "csv":
+        writer.writerow(("_id",) + USER_FIELDS)
+    count = 0
+    async for user in cursor:
+        if fmt == "csv":
+            writer.writerow([user["_id"]] + [user.get(field, "") for field in USER_FIELDS])
+        else:
+            buffer.write(dumps(user).decode() + "\n")
+        count += 1
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+@router.get("/users/export")
+async def export_users(
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
+    batch_size: int = Query(1000, ge=1, le=10_000, description="Documents fetched and flushed per chunk"),
+    admin: dict = Depends(admin_required),
+    users=Depends(collection("users"))
+):
+    """
+    📤 Admin-only endpoint: Stream every user as NDJSON or CSV in constant memory
+    """
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    headers = {"Content-Disposition": f'attachment; filename="users.{format}"'}
+    return StreamingResponse(_stream_users(users, batch_size, format), media_type=media_type, headers=headers)
 
 
 # ---------------------- DELETE USER BY ID (Admin Only) ----------------------
 @router.delete("/users/{user_id}")
-async def delete_user(user_id: str, admin: dict = Depends(admin_required)):
+async def delete_user(
+    user_id: str,
+    admin: dict = Depends(admin_required),
+    users=Depends(collection("users"))
+):
     """
     🗑️ Admin-only endpoint: Delete a specific user by their MongoDB ObjectId
     """
@@ -189,7 +263,7 @@ async def delete_user(user_id: str, admin: dict = Depends(admin_required)):
         if not ObjectId.is_valid(user_id):
             raise HTTPException(status_code=400, detail="Invalid user ID")
 
-        result = users.delete_one({"_id": ObjectId(user_id)})
+        result = await users.delete_one({"_id": ObjectId(user_id)})
 
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="User not found")
@@ -202,5 +276,5 @@ async def delete_user(user_id: str, admin: dict = Depends(admin_required)):
 
 @router.post("/logout", status_code=status.HTTP_200_OK)
 async def logout(token: str = Depends(oauth2_scheme), current_user: dict = Depends(get_current_user)):
-    revoke_token(token)
+    await revoke_token(token)
     return {"message": "Successfully logged out"}
\ No newline at end of file
@@ -1,55 +1,84 @@
-from fastapi import APIRouter, Depends, HTTPException
-from pymongo import MongoClient
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
 from bson import ObjectId
 from core.security import get_current_user
-from core.config import cart_collection
-from core.config import products
+from core.database import collection
+from core import bulk, carts
+from core.pricing import reprice
+from core.responses import BSONResponse
+from core.idempotency import idempotency_store
+from models.cart_models import BulkItems, BulkProductIds
+from typing import Optional
 
 
 router = APIRouter(prefix="/cart", tags=["Cart"])
 
 # ---------------------- ADD PRODUCT TO CART ----------------------
 @router.post("/add/{product_id}")
-async def add_to_cart(product_id: str, user: dict = Depends(get_current_user)):
+async def add_to_cart(
+    product_id: str,
+    request: Request,
+    user: dict = Depends(get_current_user),
+    products=Depends(collection("products")),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """
     🛒 Add a product to the user's cart.
+    - With an `Idempotency-Key` header, a retry does not add the product again
     """
     if not ObjectId.is_valid(product_id):
         raise HTTPException(status_code=400, detail="Invalid product ID")
 
-    product = products.find_one({"_id": ObjectId(product_id)})
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
+    async def add():
+        product = await products.find_one({"_id": ObjectId(product_id)})
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
 
-    existing_item = cart_collection.find_one({"user_email": user["sub"], "product_id": product_id})
+        # One atomic upsert on the user's cart document
+        await carts.add_item(user["sub"], product)
+        return {"message": "✅ Product added to cart successfully"}
 
-    if existing_item:
-        cart_collection.update_one(
-            {"_id": existing_item["_id"]},
-            {"$inc": {"quantity": 1}}
-        )
-    else:
-        cart_collection.insert_one({
-            "user_email": user["sub"],
-            "product_id": product_id,
-            "name": product["name"],
-            "price": product["price"],
-            "quantity": 1
-        })
+    return await idempotency_store.execute(user["sub"], idempotency_key, f"POST {request.url.path}", add)
 
-    return {"message": "✅ Product added to cart successfully"}
+
+# ---------------------- BULK ADD TO CART ----------------------
+@router.post("/bulk/add")
+async def bulk_add_to_cart(body: BulkItems, user: dict = Depends(get_current_user)):
+    """
+    🛒 Add many products at once: one product lookup and one cart update,
+    with a per-item result in request order.
+    """
+    bulk.check_size(len(body.items))
+    found = await bulk.products_by_id(bulk.valid_ids(i.product_id for i in body.items), {"name": 1, "price": 1})
+
+    results, quantities = [], {}
+    for item in body.items:
+        if not ObjectId.is_valid(item.product_id):
+            results.append(bulk.result(item.product_id, "invalid_id"))
+        elif item.quantity <= 0:
+            results.append(bulk.result(item.product_id, "invalid_quantity"))
+        elif item.product_id not in found:
+            results.append(bulk.result(item.product_id, "not_found"))
+        else:
+            quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+            results.append(bulk.result(item.product_id, "added"))
+
+    if quantities:
+        await carts.add_items(user["sub"], [(found[pid], qty) for pid, qty in quantities.items()])
+    return {"results": results, "added": len(quantities)}
 
 
 # ---------------------- GET USER CART ----------------------
 @router.get("/")
-async def get_cart(user: dict = Depends(get_current_user)):
+async def get_cart(summary: bool = False, user: dict = Depends(get_current_user)):
     """
     🧾 Get all items in the user's cart.
+    - `summary=true` reprices every line against current products and adds
+      line totals, subtotal, stock and price-change flags
     """
-    items = list(cart_collection.find({"user_email": user["sub"]}))
-    for item in items:
-        item["_id"] = str(item["_id"])
-    return {"cart_items": items, "total_items": len(items)}
+    items = carts.line_items(await carts.get_cart(user["sub"]))
+    if summary:
+        return BSONResponse({**await reprice(items), "total_items": len(items)})
+    return BSONResponse({"cart_items": items, "total_items": len(items)})
 
 
 # ---------------------- UPDATE ITEM QUANTITY ----------------------
@@ -61,12 +90,7 @@ async def update_cart_item(product_id: str, quantity: int, user: dict = Depends(
     if quantity <= 0:
         raise HTTPException(status_code=400, detail="Quantity must be greater than 0")
 
-    result = cart_collection.update_one(
-        {"user_email": user["sub"], "product_id": product_id},
-        {"$set": {"quantity": quantity}}
-    )
-
-    if result.modified_count == 0:
+    if not ObjectId.is_valid(product_id) or not await carts.set_quantity(user["sub"], product_id, quantity):
         raise HTTPException(status_code=404, detail="Product not found in cart")
 
     return {"message": "✅ Cart updated successfully"}
@@ -78,20 +102,37 @@ async def remove_from_cart(product_id: str, user: dict = Depends(get_current_use
     """
     ❌ Remove a specific product from the user's cart.
     """
-    result = cart_collection.delete_one({"user_email": user["sub"], "product_id": product_id})
-
-    if result.deleted_count == 0:
+    if not ObjectId.is_valid(product_id) or not await carts.remove_item(user["sub"], product_id):
         raise HTTPException(status_code=404, detail="Item not found in cart")
 
     return {"message": "🗑️ Product removed from cart"}
 
 
+# ---------------------- BULK REMOVE FROM CART ----------------------
+@router.post("/bulk/remove")
+async def bulk_remove_from_cart(body: BulkProductIds, user: dict = Depends(get_current_user)):
+    """
+    ❌ Remove many products from the cart in one update.
+    """
+    bulk.check_size(len(body.product_ids))
+    ids = bulk.valid_ids(body.product_ids)
+    removed = await carts.remove_items(user["sub"], ids) if ids else set()
+
+    results = []
+    for pid in body.product_ids:
+        if not ObjectId.is_valid(pid):
+            results.append(bulk.result(pid, "invalid_id"))
+        else:
+            results.append(bulk.result(pid, "removed" if pid in removed else "not_in_cart"))
+    return {"results": results, "removed": len(removed)}
+
+
 # ---------------------- CLEAR ENTIRE CART ----------------------
 @router.delete("/clear")
 async def clear_cart(user: dict = Depends(get_current_user)):
     """
     🧹 Remove all items from the user's cart.
     """
-    cart_collection.delete_many({"user_email": user["sub"]})
+    await carts.clear(user["sub"])
     return {"message": "🧺 Cart cleared successfully"}
 
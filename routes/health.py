@@ -0,0 +1,22 @@
+from fastapi import APIRouter
+from core import database
+from core.config import MONGO_BACKEND
+from core.responses import BSONResponse
+
+router = APIRouter(tags=["Health"])
+
+
+# ---------------------- HEALTH CHECK ----------------------
+@router.get("/health")
+async def health():
+    """
+    💓 Liveness + database round trip, with connection pool utilization.
+    Returns 503 when the database does not answer within HEALTH_PING_TIMEOUT.
+    """
+    body = {"status": "ok", "backend": MONGO_BACKEND}
+    try:
+        body["ping_ms"] = round(await database.ping(), 2)
+    except Exception as e:
+        body.update(status="unavailable", error=type(e).__name__)
+    body["pool"] = database.pool_stats() if MONGO_BACKEND != "memory" else None
+    return BSONResponse(body, status_code=200 if body["status"] == "ok" else 503)
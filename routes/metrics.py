@@ -0,0 +1,47 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from core.security import admin_required, token_cache
+from core.metrics import metrics, pool_listener
+from core.passwords import password_hasher
+from core.revocation import revocation_list
+from core.email_utils import mx_cache
+from core.pricing import price_cache
+from core.throttle import throttle
+from core.inventory import sharded_stock
+from core.idempotency import idempotency_store
+from core.catalog_cache import catalog_cache
+
+router = APIRouter(tags=["Metrics"])
+
+
+def _cache_gauges() -> dict:
+    series = {}
+    for name, stats in (
+        ("jwt", token_cache.stats()),
+        ("revocation", revocation_list.stats()),
+        ("password_hasher", password_hasher.stats()),
+        ("mx", mx_cache.stats()),
+        ("catalog", catalog_cache.stats()),
+        ("price", price_cache.stats()),
+        ("throttle", throttle.stats()),
+        ("stock", sharded_stock.stats()),
+        ("idempotency", idempotency_store.stats()),
+    ):
+        for stat, value in stats.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                series[(("component", name), ("stat", stat))] = value
+    pool = {}
+    for address, counters in pool_listener.stats().items():
+        for stat, value in counters.items():
+            pool[(("server", address), ("stat", stat))] = value
+    return {"app_component_stat": series, "mongo_pool_stat": pool}
+
+
+# ---------------------- ADMIN: METRICS ----------------------
+@router.get("/metrics", dependencies=[Depends(admin_required)])
+async def get_metrics():
+    """
+    📊 Admin only — request latency, Mongo command timings and component
+    counters in the Prometheus text exposition format.
+    """
+    return PlainTextResponse(metrics.render(_cache_gauges()), media_type="text/plain; version=0.0.4")
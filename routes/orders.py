@@ -1,130 +1,168 @@
-from fastapi import APIRouter, Depends, HTTPException
-from pymongo import MongoClient
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
 from bson import ObjectId
-from datetime import datetime
+from pymongo import ReturnDocument
 from math import ceil
 from core.security import get_current_user, admin_required
-from core.config import orders_collection, cart_collection, products
+from core.database import LazyCollection, collection
+from core.pagination import fetch_page, EstimatedCount
+from core import checkout, rollups
+from core.responses import BSONResponse
+from core.idempotency import idempotency_store
+from typing import Optional
 router = APIRouter(prefix="/orders", tags=["Orders"])
+order_count_estimate = EstimatedCount(LazyCollection("orders"))
+ORDER_SORT = [("created_at", -1), ("_id", -1)]
+# Order history rows: everything but the line items
+ORDER_SUMMARY_FIELDS = {"total_amount": 1, "item_count": 1, "status": 1, "created_at": 1}
 
 # ---------------------- PLACE ORDER ----------------------
 @router.post("/place")
-async def place_order(user: dict = Depends(get_current_user)):
+async def place_order(
+    request: Request,
+    user: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """
     ✅ Places an order for all items in the user's cart.
     - Checks stock availability
-    - Deducts stock from products
+    - Deducts stock from products (atomically, never below zero)
     - Clears user's cart
+    - With an `Idempotency-Key` header, a retry returns the first attempt's
+      response instead of placing a second order
     """
-    cart_items = list(cart_collection.find({"user_email": user["sub"]}))
-
-    if not cart_items:
-        raise HTTPException(status_code=400, detail="Cart is empty")
-
-    # Check stock before confirming order
-    for item in cart_items:
-        product = products.find_one({"_id": ObjectId(item["product_id"])})
-        if not product:
-            raise HTTPException(status_code=404, detail=f"Product {item['name']} not found")
-        if product["in_stock"] < item["quantity"]:
-            raise HTTPException(status_code=400, detail=f"Insufficient stock for {item['name']}")
-
-    # Place the order
-    order_data = {
-        "user_email": user["sub"],
-        "items": cart_items,
-        "total_amount": sum(i["price"] * i["quantity"] for i in cart_items),
-        "status": "Delivered",
-        "created_at": datetime.utcnow(),
-    }
-    orders_collection.insert_one(order_data)
-
-    # Decrease stock
-    for item in cart_items:
-        products.update_one(
-            {"_id": ObjectId(item["product_id"])},
-            {"$inc": {"in_stock": -item["quantity"]}}
-        )
-
-    # Clear the cart
-    cart_collection.delete_many({"user_email": user["sub"]})
-
-    return {"message": "✅ Order placed successfully and stock updated"}
+    async def place():
+        order = await checkout.place_order(user["sub"])
+        return {"message": "✅ Order placed successfully and stock updated", "order_id": str(order["_id"])}
+
+    return await idempotency_store.execute(user["sub"], idempotency_key, f"POST {request.url.path}", place)
 
 
 # ---------------------- GET USER ORDERS ----------------------
 @router.get("/my-orders")
-async def get_user_orders(user: dict = Depends(get_current_user)):
+async def get_user_orders(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Continuation token from the previous page's next_cursor"),
+    user: dict = Depends(get_current_user),
+    orders_collection=Depends(collection("orders"))
+):
     """
-    👤 Get all orders of the logged-in user.
+    👤 Get the logged-in user's orders, newest first, one page at a time.
+    - Summary rows only (no line items); use GET /orders/{order_id} for details
     """
-    orders = list(orders_collection.find({"user_email": user["sub"]}).sort("created_at", -1))
-    for order in orders:
-        order["_id"] = str(order["_id"])
-        for item in order["items"]:
-            item["_id"] = str(item["_id"])
-    return {"orders": orders, "total_orders": len(orders)}
+    query = {"user_email": user["sub"]}
+    docs, next_cursor = await fetch_page(
+        orders_collection, query, ORDER_SORT, limit, cursor=cursor, projection=dict(ORDER_SUMMARY_FIELDS)
+    )
+    return BSONResponse({
+        "orders": docs,
+        "total_orders": await orders_collection.count_documents(query),
+        "next_cursor": next_cursor
+    })
 
 
 # ---------------------- CANCEL ORDER ----------------------
 @router.delete("/cancel/{order_id}")
-async def cancel_order(order_id: str, user: dict = Depends(get_current_user)):
+async def cancel_order(
+    order_id: str,
+    user: dict = Depends(get_current_user),
+    orders_collection=Depends(collection("orders"))
+):
     """
     ❌ Cancel user's own order (only if still in Processing status)
     """
     if not ObjectId.is_valid(order_id):
         raise HTTPException(status_code=400, detail="Invalid order ID")
 
-    order = orders_collection.find_one({"_id": ObjectId(order_id), "user_email": user["sub"]})
+    order = await orders_collection.find_one({"_id": ObjectId(order_id), "user_email": user["sub"]})
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
 
     if order["status"] != "Processing":
         raise HTTPException(status_code=400, detail="Order cannot be canceled once shipped or delivered")
 
-    orders_collection.update_one(
-        {"_id": ObjectId(order_id)},
+    # Conditional on the status so a concurrent status change cannot be overwritten or counted twice
+    result = await orders_collection.update_one(
+        {"_id": ObjectId(order_id), "status": "Processing"},
         {"$set": {"status": "Canceled"}}
     )
+    if result.modified_count == 0:
+        raise HTTPException(status_code=400, detail="Order cannot be canceled once shipped or delivered")
+
+    await rollups.record_safely(order, sign=-1)
     return {"message": "🛑 Order canceled successfully"}
 
 
 # ---------------------- ADMIN: VIEW ALL ORDERS ----------------------
 @router.get("/all", dependencies=[Depends(admin_required)])
-async def get_all_orders(page: int = 1, limit: int = 10):
+async def get_all_orders(
+    page: int = Query(1, ge=1, description="Page number (prefer `cursor` for anything past the first page)"),
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Continuation token from the previous page's next_cursor"),
+    include_total: bool = Query(False, description="Exact count instead of the cached estimate"),
+    orders_collection=Depends(collection("orders")),
+):
     """
-    🧾 Admin only — view all orders with pagination.
+    🧾 Admin only — view all orders, newest first, with keyset pagination.
     """
-    skip = (page - 1) * limit
-    total_orders = orders_collection.count_documents({})
-    total_pages = ceil(total_orders / limit)
+    skip = 0 if cursor else (page - 1) * limit
+    docs, next_cursor = await fetch_page(orders_collection, {}, ORDER_SORT, limit, cursor=cursor, skip=skip)
 
-    cursor = orders_collection.find().sort("created_at", -1).skip(skip).limit(limit)
-    data = []
-    for order in cursor:
-        order["_id"] = str(order["_id"])
-        for item in order["items"]:
-            item["_id"] = str(item["_id"])
-        data.append(order)
+    if include_total:
+        total_orders = await orders_collection.count_documents({})
+    else:
+        total_orders = await order_count_estimate.get()
+    total_pages = ceil(total_orders / limit)
 
-    return {"page": page, "total_pages": total_pages, "orders": data}
+    return BSONResponse({
+        "page": page,
+        "total_pages": total_pages,
+        "total_is_estimate": not include_total,
+        "orders": docs,
+        "next_cursor": next_cursor
+    })
 
 
 # ---------------------- ADMIN: UPDATE ORDER STATUS ----------------------
 @router.put("/update-status/{order_id}", dependencies=[Depends(admin_required)])
-async def update_order_status(order_id: str, status: str):
+async def update_order_status(order_id: str, status: str, orders_collection=Depends(collection("orders"))):
     """
     🚚 Admin updates the order status (e.g., Shipped, Delivered, etc.)
     """
     if status not in ["Processing", "Shipped", "Delivered", "Canceled"]:
         raise HTTPException(status_code=400, detail="Invalid status value")
 
-    result = orders_collection.update_one(
+    before = await orders_collection.find_one_and_update(
         {"_id": ObjectId(order_id)},
-        {"$set": {"status": status}}
+        {"$set": {"status": status}},
+        projection={"items": 1, "created_at": 1, "status": 1},
+        return_document=ReturnDocument.BEFORE
     )
 
-    if result.matched_count == 0:
+    if before is None:
+        raise HTTPException(status_code=404, detail="Order not found")
+
+    # Canceled orders are excluded from sales rollups
+    if (before["status"] == "Canceled") != (status == "Canceled"):
+        await rollups.record_safely(before, sign=-1 if status == "Canceled" else 1)
+
+    return {"message": f"✅ Order status updated to '{status}'"}
+
+
+# ---------------------- ORDER DETAILS ----------------------
+@router.get("/{order_id}")
+async def get_order(
+    order_id: str,
+    user: dict = Depends(get_current_user),
+    orders_collection=Depends(collection("orders"))
+):
+    """
+    🔎 Get one of the logged-in user's orders, including its line items.
+    """
+    if not ObjectId.is_valid(order_id):
+        raise HTTPException(status_code=400, detail="Invalid order ID")
+
+    order = await orders_collection.find_one({"_id": ObjectId(order_id), "user_email": user["sub"]})
+    if not order:
         raise HTTPException(status_code=404, detail="Order not found")
 
-    return {"message": f"✅ Order status updated to '{status}'"}
\ No newline at end of file
+    return BSONResponse(order)
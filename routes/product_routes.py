@@ -1,37 +1,160 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from core.security import admin_required
-from core.config import products
+from core.database import collection
+from core.catalog_cache import catalog_cache
+from core.pricing import price_cache
+from core.inventory import sharded_stock
+from core.responses import BSONResponse, dumps
+from core.pagination import fetch_page, encode_values, decode_values
+from core.search import HIDE_SEARCH_FIELDS, with_search_fields, normalize_category, tokenize, search_query, ranked_search
 from models.product_models import ProductModel
-from typing import Optional
+from typing import Optional, Literal
 from math import ceil
 
 router = APIRouter()
 
+PRODUCT_FIELDS = set(ProductModel.__fields__)
+# Internal bookkeeping fields never returned to clients
+HIDDEN_FIELDS = {**HIDE_SEARCH_FIELDS, "stock_holds": 0, "stock_shards": 0}
+
+
+async def _stream_products(products, projection: dict, batch_size: int, fmt: str):
+    """Yield the catalog in chunks of `batch_size` documents as NDJSON or one JSON object."""
+    cursor = products.find({}, projection).batch_size(batch_size)
+    chunk = []
+    first = True
+
+    if fmt == "json":
+        yield '{"products": ['
+    async for doc in cursor:
+        chunk.append(dumps(doc).decode())
+        if len(chunk) >= batch_size:
+            yield _join_chunk(chunk, fmt, first)
+            chunk = []
+            first = False
+    if chunk:
+        yield _join_chunk(chunk, fmt, first)
+    if fmt == "json":
+        yield ']}'
+
+
+def _join_chunk(chunk, fmt, first):
+    if fmt == "ndjson":
+        return "\n".join(chunk) + "\n"
+    return ("" if first else ",") + ",".join(chunk)
+
+
 @router.get("/")
-async def list_products():
-    data = list(products.find({}, {"_id": 0}))
-    return {"products": data}
+async def list_products(
+    stream: bool = Query(False, description="Stream the catalog instead of building one response"),
+    format: Literal["json", "ndjson"] = Query("json", description="Streaming format: chunked JSON array or NDJSON"),
+    batch_size: int = Query(500, ge=1, le=10_000, description="Documents fetched and flushed per chunk"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to include, e.g. name,price"),
+    products=Depends(collection("products")),
+):
+    if stream:
+        projection = {"_id": 0}
+        if fields:
+            requested = {f.strip() for f in fields.split(",") if f.strip()}
+            unknown = requested - PRODUCT_FIELDS
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+            projection.update({f: 1 for f in requested})
+        else:
+            projection.update(HIDDEN_FIELDS)
+        media_type = "application/x-ndjson" if format == "ndjson" else "application/json"
+        return StreamingResponse(_stream_products(products, projection, batch_size, format), media_type=media_type)
+
+    async def load():
+        data = await products.find({}, {**HIDDEN_FIELDS, "_id": 0}).to_list(length=None)
+        return {"products": data}
+
+    return BSONResponse(await catalog_cache.get_or_load(("all",), load))
 
 @router.post("/")
-async def add_product(product: ProductModel, admin: dict = Depends(admin_required)):
-    products.insert_one(product.dict())
+async def add_product(
+    product: ProductModel,
+    admin: dict = Depends(admin_required),
+    products=Depends(collection("products"))
+):
+    await products.insert_one(with_search_fields(product.dict()))
+    catalog_cache.invalidate()
+    price_cache.clear()
     return {"message": "Product added successfully"}
 
 @router.put("/{name}")
-async def update_product(name: str, product: ProductModel, admin: dict = Depends(admin_required)):
-    result = products.update_one({"name": name}, {"$set": product.dict()})
-    if result.matched_count == 0:
+async def update_product(
+    name: str,
+    product: ProductModel,
+    admin: dict = Depends(admin_required),
+    products=Depends(collection("products"))
+):
+    before = await products.find_one_and_update(
+        {"name": name}, {"$set": with_search_fields(product.dict())}, projection={"stock_shards": 1}
+    )
+    if not before:
         raise HTTPException(status_code=404, detail="Product not found")
+    if "stock_shards" in before:
+        # Restock: the new in_stock replaces what is left in the shard counters
+        await sharded_stock.reset(before["_id"], before["stock_shards"], product.in_stock)
+    catalog_cache.invalidate()
+    price_cache.clear()
     return {"message": "Product updated successfully"}
 
 @router.delete("/{name}")
-async def delete_product(name: str, admin: dict = Depends(admin_required)):
-    result = products.delete_one({"name": name})
-    if result.deleted_count == 0:
+async def delete_product(
+    name: str,
+    admin: dict = Depends(admin_required),
+    products=Depends(collection("products"))
+):
+    deleted = await products.find_one_and_delete({"name": name}, projection={"stock_shards": 1})
+    if not deleted:
         raise HTTPException(status_code=404, detail="Product not found")
+    if "stock_shards" in deleted:
+        await sharded_stock.discard(deleted["_id"])
+    catalog_cache.invalidate()
+    price_cache.clear()
     return {"message": "Product deleted successfully"}
 
 
+# ---------------------- ADMIN: SHARDED STOCK ----------------------
+@router.post("/{name}/stock-shards")
+async def enable_stock_shards(
+    name: str,
+    shards: int = Query(16, ge=2, le=256, description="Number of stock counters to spread the stock over"),
+    admin: dict = Depends(admin_required),
+    products=Depends(collection("products"))
+):
+    """
+    🔥 Admin only — split a hot product's stock across `shards` counters so
+    concurrent checkouts stop contending on one document (e.g. before a sale).
+    """
+    product = await products.find_one({"name": name}, {"_id": 1})
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    if not await sharded_stock.enable(product["_id"], shards):
+        raise HTTPException(status_code=409, detail="Product stock is already sharded or held by a checkout in progress")
+    return {"message": f"Stock split across {shards} counters"}
+
+@router.delete("/{name}/stock-shards")
+async def disable_stock_shards(
+    name: str,
+    admin: dict = Depends(admin_required),
+    products=Depends(collection("products"))
+):
+    """
+    📦 Admin only — fold the stock counters back into the product's `in_stock`.
+    """
+    product = await products.find_one({"name": name}, {"_id": 1})
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    if not await sharded_stock.disable(product["_id"]):
+        raise HTTPException(status_code=409, detail="Product stock is not sharded")
+    catalog_cache.invalidate()
+    return {"message": "Stock counters merged"}
+
+
 
 # @router.get("/pagination")
 # async def get_products(page: int = Query(1, ge=1, description="Page number")):
@@ -64,21 +187,24 @@ async def delete_product(name: str, admin: dict = Depends(admin_required)):
 
 @router.get("/filters")
 async def filter_products(
-    page: int = Query(1, ge=1, description="Page number"),
-    name: Optional[str] = Query(None, description="Search by product name"),
+    page: int = Query(1, ge=1, description="Page number (prefer `cursor` for anything past the first page)"),
+    cursor: Optional[str] = Query(None, description="Continuation token from the previous page's next_cursor"),
+    include_total: bool = Query(False, description="Also count all matches (costs an extra query)"),
+    name: Optional[str] = Query(None, description="Search product name and description (word prefixes, ranked)"),
     min_price: Optional[float] = Query(None, description="Minimum price filter"),
     max_price: Optional[float] = Query(None, description="Maximum price filter"),
     in_stock: Optional[bool] = Query(None, description="Only show in-stock items"),
-    category: Optional[str] = Query(None, description="Filter by category")  # 🆕
+    category: Optional[str] = Query(None, description="Filter by category"),  # 🆕
+    products=Depends(collection("products"))
 ):
     """
     ✅ Filter + Pagination Endpoint
     Supports:
-      - Search by name
+      - Search by name/description words, ranked by relevance
       - Filter by price range
       - Filter by stock availability
       - Filter by category
-      - Returns paginated results (10 per page)
+      - Returns paginated results (10 per page) with a `next_cursor` for the next page
     """
     limit = 10
     skip = (page - 1) * limit
@@ -86,8 +212,6 @@ async def filter_products(
     # --- Build dynamic MongoDB query ---
     query = {}
 
-    if name:
-        query["name"] = {"$regex": name, "$options": "i"}  # case-insensitive
     if min_price is not None and max_price is not None:
         query["price"] = {"$gte": min_price, "$lte": max_price}
     elif min_price is not None:
@@ -97,22 +221,48 @@ async def filter_products(
     if in_stock is not None:
         query["in_stock"] = {"$gt": 0} if in_stock else {"$lte": 0}
     if category:
-        query["category"] = {"$regex": f"^{category}$", "$options": "i"}  # exact match (case-insensitive)
-
-    # --- Pagination + Query Execution ---
-    total_products = products.count_documents(query)
-    total_pages = ceil(total_products / limit) if total_products > 0 else 1
+        query["category_lc"] = normalize_category(category)  # exact match (case-insensitive, indexed)
 
-    if page > total_pages and total_products > 0:
-        raise HTTPException(status_code=404, detail="Page not found")
+    # --- Pagination + Query Execution (cached per normalized filter) ---
+    async def load():
+        # A name with no word characters ("-", "!!") searches nothing: plain listing
+        if tokenize(name):
+            # Relevance-ranked, served from the search_terms index
+            ids, next_key = await ranked_search(
+                products, name, query, limit,
+                after=decode_values(cursor, 2) if cursor else None, skip=0 if cursor else skip
+            )
+            found = await products.find({"_id": {"$in": ids}}, {**HIDDEN_FIELDS}).to_list(length=None)
+            by_id = {doc["_id"]: doc for doc in found}
+            docs = [by_id[i] for i in ids if i in by_id]
+            next_cursor = encode_values(next_key) if next_key else None
+        else:
+            docs, next_cursor = await fetch_page(
+                products, query, [("_id", 1)], limit,
+                cursor=cursor, skip=0 if cursor else skip, projection={**HIDDEN_FIELDS}
+            )
+        if not docs and page > 1 and not cursor:
+            raise HTTPException(status_code=404, detail="Page not found")
 
-    cursor = products.find(query).skip(skip).limit(limit)
-    data = []
-    for item in cursor:
-        item["_id"] = str(item["_id"])
-        data.append(item)
+        result = {
+            "products": docs,
+            "next_cursor": next_cursor
+        }
+        if include_total:
+            total_products = await products.count_documents({**query, **search_query(name)})
+            result["total_products"] = total_products
+            result["total_pages"] = ceil(total_products / limit) if total_products > 0 else 1
+        return result
 
-    return {
-        
-        "products": data
-    }
+    cache_key = (
+        "filter",
+        page,
+        cursor,
+        include_total,
+        " ".join(tokenize(name)) if name else None,
+        min_price,
+        max_price,
+        in_stock,
+        category.lower() if category else None,
+    )
+    return BSONResponse(await catalog_cache.get_or_load(cache_key, load))
@@ -1,8 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
-from pymongo import MongoClient
 from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from core.security import get_current_user
-from core.config import products, wishlist_collection, cart_collection
+from core.database import collection
+from core import bulk, carts
+from core.responses import BSONResponse
+from models.cart_models import BulkProductIds
 
 router = APIRouter(prefix="/wishlist", tags=["Wishlist"])
 
@@ -10,39 +14,50 @@ router = APIRouter(prefix="/wishlist", tags=["Wishlist"])
 
 # ---------------------- ADD TO WISHLIST ----------------------
 @router.post("/add/{product_id}")
-async def add_to_wishlist(product_id: str, user: dict = Depends(get_current_user)):
+async def add_to_wishlist(
+    product_id: str,
+    user: dict = Depends(get_current_user),
+    products=Depends(collection("products")),
+    wishlist_collection=Depends(collection("wishlist"))
+):
     if not ObjectId.is_valid(product_id):
         raise HTTPException(status_code=400, detail="Invalid product ID")
 
-    product = products.find_one({"_id": ObjectId(product_id)})
+    product = await products.find_one({"_id": ObjectId(product_id)})
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    if wishlist_collection.find_one({"user_email": user["sub"], "product_id": product_id}):
+    # The unique (user_email, product_id) index rejects duplicates
+    try:
+        await wishlist_collection.insert_one({
+            "user_email": user["sub"],
+            "product_id": product_id,
+            "name": product["name"],
+            "price": product["price"]
+        })
+    except DuplicateKeyError:
         raise HTTPException(status_code=400, detail="Product already in wishlist")
-
-    wishlist_collection.insert_one({
-        "user_email": user["sub"],
-        "product_id": product_id,
-        "name": product["name"],
-        "price": product["price"]
-    })
     return {"message": "✅ Product added to wishlist"}
 
 
 # ---------------------- GET USER WISHLIST ----------------------
 @router.get("/")
-async def get_wishlist(user: dict = Depends(get_current_user)):
-    items = list(wishlist_collection.find({"user_email": user["sub"]}))
-    for item in items:
-        item["_id"] = str(item["_id"])
-    return {"wishlist": items, "total_items": len(items)}
+async def get_wishlist(
+    user: dict = Depends(get_current_user),
+    wishlist_collection=Depends(collection("wishlist"))
+):
+    items = await wishlist_collection.find({"user_email": user["sub"]}).to_list(length=None)
+    return BSONResponse({"wishlist": items, "total_items": len(items)})
 
 
 # ---------------------- REMOVE FROM WISHLIST ----------------------
 @router.delete("/remove/{product_id}")
-async def remove_from_wishlist(product_id: str, user: dict = Depends(get_current_user)):
-    result = wishlist_collection.delete_one({"user_email": user["sub"], "product_id": product_id})
+async def remove_from_wishlist(
+    product_id: str,
+    user: dict = Depends(get_current_user),
+    wishlist_collection=Depends(collection("wishlist"))
+):
+    result = await wishlist_collection.delete_one({"user_email": user["sub"], "product_id": product_id})
 
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Item not found in wishlist")
@@ -52,7 +67,12 @@ async def remove_from_wishlist(product_id: str, user: dict = Depends(get_current
 
 # ---------------------- MOVE FROM WISHLIST → CART ----------------------
 @router.post("/move-to-cart/{product_id}")
-async def move_to_cart(product_id: str, user: dict = Depends(get_current_user)):
+async def move_to_cart(
+    product_id: str,
+    user: dict = Depends(get_current_user),
+    wishlist_collection=Depends(collection("wishlist")),
+    products=Depends(collection("products"))
+):
     """
     🔄 Move a product from wishlist to cart.
     - Removes item from wishlist
@@ -62,32 +82,128 @@ async def move_to_cart(product_id: str, user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=400, detail="Invalid product ID")
 
     # Find the wishlist item
-    wishlist_item = wishlist_collection.find_one({"user_email": user["sub"], "product_id": product_id})
+    wishlist_item = await wishlist_collection.find_one({"user_email": user["sub"], "product_id": product_id})
     if not wishlist_item:
         raise HTTPException(status_code=404, detail="Product not found in wishlist")
 
     # Check if product exists in DB
-    product = products.find_one({"_id": ObjectId(product_id)})
+    product = await products.find_one({"_id": ObjectId(product_id)})
     if not product:
         raise HTTPException(status_code=404, detail="Product not found in database")
 
     # Add to cart (or increase quantity)
-    existing_cart_item = cart_collection.find_one({"user_email": user["sub"], "product_id": product_id})
-    if existing_cart_item:
-        cart_collection.update_one(
-            {"_id": existing_cart_item["_id"]},
-            {"$inc": {"quantity": 1}}
-        )
-    else:
-        cart_collection.insert_one({
-            "user_email": user["sub"],
-            "product_id": product_id,
-            "name": product["name"],
-            "price": product["price"],
-            "quantity": 1
-        })
+    await carts.add_item(user["sub"], product)
 
     # Remove from wishlist
-    wishlist_collection.delete_one({"_id": wishlist_item["_id"]})
+    await wishlist_collection.delete_one({"_id": wishlist_item["_id"]})
 
-    return {"message": f"✅ '{product['name']}' moved from wishlist to cart"}
\ No newline at end of file
+    return {"message": f"✅ '{product['name']}' moved from wishlist to cart"}
+
+
+# ---------------------- BULK ADD TO WISHLIST ----------------------
+@router.post("/bulk/add")
+async def bulk_add_to_wishlist(
+    body: BulkProductIds,
+    user: dict = Depends(get_current_user),
+    wishlist_collection=Depends(collection("wishlist"))
+):
+    """
+    ✅ Add many products at once: one product lookup and one bulk_write of
+    upserts, with a per-item result in request order.
+    """
+    bulk.check_size(len(body.product_ids))
+    found = await bulk.products_by_id(bulk.valid_ids(body.product_ids), {"name": 1, "price": 1})
+
+    to_add = [pid for pid in bulk.valid_ids(body.product_ids) if pid in found]
+    ops = [
+        UpdateOne(
+            {"user_email": user["sub"], "product_id": pid},
+            {"$setOnInsert": {"name": found[pid]["name"], "price": found[pid]["price"]}},
+            upsert=True
+        )
+        for pid in to_add
+    ]
+    added = set()
+    if ops:
+        try:
+            result = await wishlist_collection.bulk_write(ops, ordered=False)
+            upserted = result.upserted_ids
+        except BulkWriteError as e:
+            # A concurrent add of the same product loses to the unique index; that line already exists.
+            # Anything else (validation, write concern) is a real failure.
+            if e.details.get("writeConcernErrors") or any(
+                error.get("code") != 11000 for error in e.details.get("writeErrors", [])
+            ):
+                raise
+            upserted = {u["index"]: u["_id"] for u in e.details.get("upserted", [])}
+        added = {to_add[index] for index in upserted}
+
+    results = []
+    for pid in body.product_ids:
+        if not ObjectId.is_valid(pid):
+            results.append(bulk.result(pid, "invalid_id"))
+        elif pid not in found:
+            results.append(bulk.result(pid, "not_found"))
+        else:
+            results.append(bulk.result(pid, "added" if pid in added else "already_in_wishlist"))
+            added.discard(pid)
+    return {"results": results}
+
+
+# ---------------------- BULK REMOVE FROM WISHLIST ----------------------
+@router.post("/bulk/remove")
+async def bulk_remove_from_wishlist(
+    body: BulkProductIds,
+    user: dict = Depends(get_current_user),
+    wishlist_collection=Depends(collection("wishlist"))
+):
+    """
+    🗑️ Remove many products from the wishlist with one delete.
+    """
+    bulk.check_size(len(body.product_ids))
+    query = {"user_email": user["sub"], "product_id": {"$in": list(set(body.product_ids))}}
+    present = {item["product_id"] async for item in wishlist_collection.find(query, {"product_id": 1})}
+    if present:
+        await wishlist_collection.delete_many({**query, "product_id": {"$in": list(present)}})
+
+    results = [bulk.result(pid, "removed" if pid in present else "not_in_wishlist") for pid in body.product_ids]
+    return {"results": results, "removed": len(present)}
+
+
+# ---------------------- BULK MOVE FROM WISHLIST → CART ----------------------
+@router.post("/bulk/move-to-cart")
+async def bulk_move_to_cart(
+    body: BulkProductIds,
+    user: dict = Depends(get_current_user),
+    wishlist_collection=Depends(collection("wishlist"))
+):
+    """
+    🔄 Move many products from wishlist to cart: one wishlist read, one
+    product lookup, one cart update and one wishlist delete.
+    """
+    bulk.check_size(len(body.product_ids))
+    ids = bulk.valid_ids(body.product_ids)
+    wished = {
+        item["product_id"]: item["_id"]
+        async for item in wishlist_collection.find(
+            {"user_email": user["sub"], "product_id": {"$in": ids}}, {"product_id": 1}
+        )
+    }
+    found = await bulk.products_by_id(list(wished), {"name": 1, "price": 1})
+
+    moved = [pid for pid in ids if pid in wished and pid in found]
+    if moved:
+        await carts.add_items(user["sub"], [(found[pid], 1) for pid in moved])
+        await wishlist_collection.delete_many({"_id": {"$in": [wished[pid] for pid in moved]}})
+
+    results = []
+    for pid in body.product_ids:
+        if not ObjectId.is_valid(pid):
+            results.append(bulk.result(pid, "invalid_id"))
+        elif pid not in wished:
+            results.append(bulk.result(pid, "not_in_wishlist"))
+        elif pid not in found:
+            results.append(bulk.result(pid, "not_found"))
+        else:
+            results.append(bulk.result(pid, "moved"))
+    return {"results": results, "moved": len(moved)}
@@ -0,0 +1,28 @@
+"""
+Tests run against the in-memory (mongomock) backend unless MONGO_BACKEND is
+set, so `python -m pytest` works offline.
+"""
+import asyncio
+import os
+import sys
+
+os.environ.setdefault("MONGO_BACKEND", "memory")
+os.environ.setdefault("SMTP_BACKEND", "local")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from core import database
+
+
+@pytest.fixture
+def run():
+    """Run a coroutine function against a freshly connected database: `run(lambda db: ...)`."""
+    def runner(test):
+        async def main():
+            db = await database.connect()
+            try:
+                return await test(db)
+            finally:
+                database.close()
+        return asyncio.run(main())
+    return runner
@@ -0,0 +1,42 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from core import carts, checkout
+from core.inventory import sharded_stock
+
+STOCK = 7
+BUYERS = 25
+
+
+async def _flash_sale(db, shards):
+    """Every buyer checks out one unit at once; returns (orders placed, units left)."""
+    product = {"name": "Flash", "price": 1.0, "in_stock": STOCK, "category": "Deals"}
+    product["_id"] = (await db["products"].insert_one(product)).inserted_id
+    if shards:
+        assert await sharded_stock.enable(product["_id"], shards)
+    emails = [f"buyer{i}@example.com" for i in range(BUYERS)]
+    for email in emails:
+        await carts.add_item(email, product, 1)
+
+    async def buy(email):
+        try:
+            await checkout.place_order(email)
+            return True
+        except HTTPException as e:
+            assert e.status_code == 400
+            return False
+
+    placed = sum(await asyncio.gather(*(buy(email) for email in emails)))
+    if shards:
+        assert await sharded_stock.disable(product["_id"])
+    left = (await db["products"].find_one({"_id": product["_id"]}))["in_stock"]
+    assert await db["orders"].count_documents({}) == placed
+    return placed, left
+
+
+@pytest.mark.parametrize("shards", [0, 4])
+def test_concurrent_checkout_never_oversells(run, shards):
+    placed, left = run(lambda db: _flash_sale(db, shards))
+    assert 0 < placed <= STOCK
+    assert left >= 0
+    assert placed + left == STOCK
@@ -0,0 +1,21 @@
+import os
+import pytest
+from core import schema
+
+
+@pytest.mark.parametrize("name, query, sort", schema.ROUTE_QUERIES)
+def test_route_query_has_a_declared_index(name, query, sort):
+    assert schema.index_for(name, query, sort) is not None, f"{name} {query} sort={sort} would scan"
+
+
+def test_unindexed_query_is_reported():
+    assert schema.index_for("products", {"price": {"$lte": 10}}) is None
+    assert schema.index_for("orders", {}, [("total_amount", -1)]) is None
+
+
+@pytest.mark.skipif(os.environ["MONGO_BACKEND"] == "memory", reason="explain needs a real server")
+def test_route_queries_avoid_collscan(run):
+    async def check(db):
+        await schema.bootstrap(db)
+        return await schema.explain_route_queries(db)
+    assert run(check) == []